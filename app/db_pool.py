@@ -0,0 +1,112 @@
+"""
+db_pool.py — pool of read-only SQLite connections for the API routes.
+
+Opening a connection per query pays the connect, schema parse and a cold page
+cache every time. The pool keeps idle connections (``mode=ro`` URI,
+``query_only``, larger page cache and mmap) and hands them out one request
+thread at a time, so it works the same under threaded and gevent servers.
+
+``ingest.py`` may replace the database file. Every checkout compares the file
+identity (device, inode) the connection was opened on with the current one and
+drops connections to a replaced file instead of serving stale data.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+CACHE_SIZE_KB_DEFAULT = 16 * 1024
+MMAP_SIZE_MB_DEFAULT = 256
+MAX_IDLE_DEFAULT = 8
+
+
+def _file_identity(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class ReadOnlyConnectionPool:
+    """Idle read-only connections to one database file, reused across requests."""
+
+    def __init__(self, db_path, max_idle=MAX_IDLE_DEFAULT, cache_size_kb=CACHE_SIZE_KB_DEFAULT,
+                 mmap_size_mb=MMAP_SIZE_MB_DEFAULT):
+        self.db_path = str(db_path)
+        self.max_idle = max(max_idle, 0)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self._lock = threading.Lock()
+        self._idle = []  # [(connection, file identity)]
+        self._stats = {"hits": 0, "misses": 0, "reconnects": 0, "discarded": 0}
+
+    def _connect(self):
+        uri = "file:" + self.db_path.replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        # Connections move between request threads, but only one thread holds one at a time.
+        db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA query_only = ON")
+        db.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        db.execute(f"PRAGMA mmap_size = {int(self.mmap_size_mb) * 1024 * 1024}")
+        return db
+
+    def _checkout(self):
+        identity = _file_identity(self.db_path)
+        stale = []
+        with self._lock:
+            while self._idle:
+                db, db_identity = self._idle.pop()
+                if db_identity == identity:
+                    self._stats["hits"] += 1
+                    break
+                stale.append(db)
+            else:
+                db = None
+                self._stats["misses"] += 1
+            self._stats["reconnects"] += len(stale)
+        for old in stale:
+            old.close()
+        if db is None:
+            db = self._connect()
+        return db, identity
+
+    def _checkin(self, db, identity):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((db, identity))
+                return
+            self._stats["discarded"] += 1
+        db.close()
+
+    @contextmanager
+    def connection(self):
+        """Yield a pooled connection; it goes back to the pool unless the block raised."""
+        db, identity = self._checkout()
+        try:
+            yield db
+        except BaseException:
+            # The error may come from a replaced or broken file, so never reuse the connection.
+            db.close()
+            raise
+        self._checkin(db, identity)
+
+    def query(self, sql, params=()):
+        with self.connection() as db:
+            rows = db.execute(sql, params).fetchall()
+        return [dict(r) for r in rows]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db, _ in idle:
+            db.close()
+
+    def stats(self):
+        """Return hit/miss counters, the hit rate and the number of idle connections."""
+        with self._lock:
+            stats = dict(self._stats, idle=len(self._idle))
+        checkouts = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / checkouts, 4) if checkouts else None
+        return stats
@@ -1,8 +1,11 @@
+import hashlib
 import importlib.util
+import json
 import os
 import re
 import sqlite3
-from datetime import date as _date
+from datetime import date as _date, datetime, timezone
+from functools import wraps
 
 from dotenv import load_dotenv
 import pathlib
@@ -12,12 +15,22 @@ from jinja2 import TemplateNotFound
 from flask_caching import Cache
 
 _BW_DIR = pathlib.Path(__file__).parent.parent / "bikecounters_web"
+_PLZNITO_DIR = pathlib.Path(__file__).parent.parent / "plznito_monitoring"
 
 _spec = importlib.util.spec_from_file_location("bikecounters_web.config", _BW_DIR / "config.py")
 bw_cfg = importlib.util.module_from_spec(_spec)
 _spec.loader.exec_module(bw_cfg)
 
+_ca_spec = importlib.util.spec_from_file_location("bikecounters_web.counts_api", _BW_DIR / "counts_api.py")
+counts_api = importlib.util.module_from_spec(_ca_spec)
+_ca_spec.loader.exec_module(counts_api)
+
+_mi_spec = importlib.util.spec_from_file_location("plznito_monitoring.marker_index", _PLZNITO_DIR / "marker_index.py")
+marker_index = importlib.util.module_from_spec(_mi_spec)
+_mi_spec.loader.exec_module(marker_index)
+
 from app import app
+from app.db_pool import ReadOnlyConnectionPool
 from app.train_delays import scrape_babitron_delays
 
 load_dotenv()
@@ -48,15 +61,90 @@ CORS_MAX_AGE = os.getenv("TRAIN_DELAYS_CORS_MAX_AGE") or "600"
 _DATE_RE             = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 _MAX_DATE_RANGE_DAYS = _env_int("BIKECOUNTERS_MAX_DATE_RANGE_DAYS", 730)
 _MAX_RESULT_ROWS     = _env_int("BIKECOUNTERS_MAX_RESULT_ROWS", 50_000)
+# Part of the API ETags: nav and counts also change when the location config is redeployed.
+_BW_CONFIG_TAG       = hashlib.sha1((_BW_DIR / "config.py").read_bytes()).hexdigest()[:8]
+# Responses are keyed by the ingest data generation, so the timeout only bounds stale entries.
+_API_CACHE_TIMEOUT   = max(_env_int("BIKECOUNTERS_CACHE_TIMEOUT_SECONDS", 24 * 3600), 1)
+
+PLZNITO_MAP_DATA_DIR = pathlib.Path(os.getenv("PLZNITO_MAP_DATA_DIR") or _PLZNITO_DIR / "map_data")
+_MAP_ASSET_RE        = re.compile(r"^[A-Za-z0-9_-]+\.([0-9a-f]{16})\.json$")
+# Preferred first; ETag suffix keeps each encoded representation distinct.
+_MAP_ASSET_ENCODINGS = (("br", ".br", "-br"), ("gzip", ".gz", "-gz"))
+_MAP_ASSET_BASENAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+_MARKERS_MAX_ZOOM      = 22
+
+# asset basename -> (asset file name, MarkerGridIndex), rebuilt when a newer asset appears
+_marker_indexes = {}
 
-cache = Cache(app, config={"CACHE_TYPE": "simple", "CACHE_DEFAULT_TIMEOUT": CACHE_TIMEOUT_SECONDS})
+cache = Cache(app, config={
+    "CACHE_TYPE": "simple",
+    "CACHE_DEFAULT_TIMEOUT": CACHE_TIMEOUT_SECONDS,
+    "CACHE_THRESHOLD": max(_env_int("BIKECOUNTERS_CACHE_MAX_ITEMS", 500), 1),
+})
+
+
+# Read-only connections to the bikecounters DB, reused across requests of this worker.
+db_pool = ReadOnlyConnectionPool(
+    bw_cfg.DB_PATH,
+    max_idle=_env_int("BIKECOUNTERS_DB_POOL_SIZE", 8),
+    cache_size_kb=_env_int("BIKECOUNTERS_DB_CACHE_KB", 16 * 1024),
+    mmap_size_mb=_env_int("BIKECOUNTERS_DB_MMAP_MB", 256),
+)
 
 
 def query(sql, params=()):
-    with sqlite3.connect(bw_cfg.DB_PATH) as db:
-        db.row_factory = sqlite3.Row
-        rows = db.execute(sql, params).fetchall()
-    return [dict(r) for r in rows]
+    return db_pool.query(sql, params)
+
+
+def _data_generation():
+    """Return ``(generation, updated_at epoch)`` stamped by ingest.py, or None before its first run."""
+    try:
+        rows = query("SELECT key, value FROM meta WHERE key IN ('generation', 'updated_at')")
+    except sqlite3.OperationalError:  # no DB or no meta table yet
+        return None
+    meta = {row["key"]: row["value"] for row in rows}
+    if "generation" not in meta:
+        return None
+    return meta["generation"], meta.get("updated_at")
+
+
+def _generation_cached(view):
+    """
+    Serve a bikecounters API view with an ETag of the ingest data generation
+    (and the config.py revision).
+
+    A matching If-None-Match gets a 304 without running the view. Otherwise the
+    JSON body comes from the response cache, keyed by generation and full path,
+    so a new ingest generation invalidates every cached body at once.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        stamp = _data_generation()
+        if stamp is None:
+            return view(*args, **kwargs)
+        generation, updated_at = stamp
+        etag = f"bc-{generation}-{_BW_CONFIG_TAG}"
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            cache_key = f"bikecounters:{generation}:{request.full_path}"
+            body = cache.get(cache_key)
+            if body is None:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                cache.set(cache_key, body, timeout=_API_CACHE_TIMEOUT)
+            response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        if updated_at is not None:
+            response.last_modified = datetime.fromtimestamp(updated_at, timezone.utc)
+        # Clients may keep the body but must revalidate, the next ingest can land any time.
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request) if response.status_code == 200 else response
+
+    return wrapper
 
 
 @app.after_request
@@ -65,7 +153,7 @@ def add_cors_headers(response):
     response.headers["Access-Control-Allow-Methods"] = CORS_ALLOW_METHODS
     response.headers["Access-Control-Allow-Headers"] = CORS_ALLOW_HEADERS
     response.headers["Access-Control-Max-Age"] = CORS_MAX_AGE
-    response.headers["Vary"] = "Origin"
+    response.vary.add("Origin")
     return response
 
 @app.route('/')
@@ -74,6 +162,8 @@ def root():
         ("GET", "/train_delays/",              "Train delays (cached)"),
         ("GET", "/plznito/map-bike",            "Plzeň bike map"),
         ("GET", "/plznito/map-all",             "Plzeň full map"),
+        ("GET", "/plznito/data/<asset>",        "Hashed map marker data (immutable, precompressed)"),
+        ("GET", "/plznito/api/markers/<name>?bbox=w,s,e,n&zoom=Z", "Map markers in a viewport (time/status/category filters)"),
         ("GET", "/bikecounters",                "Cycling counters SPA"),
         ("GET", "/bikecounters/api/nav",                     "Navigation tree for cycling counters"),
         ("GET", "/bikecounters/api/location/<loc_id>",       "Location metadata"),
@@ -110,6 +200,112 @@ def plznito_map_all():
                              ' --file_in plznito_all.json'
                              ' --file_out templates/plznito_map_all.html'), 503
 
+@app.route('/plznito/data/<filename>')
+def plznito_map_data(filename):
+    match = _MAP_ASSET_RE.match(filename)
+    if not match:
+        abort(404)
+    asset_path = PLZNITO_MAP_DATA_DIR / filename
+    if not asset_path.is_file():
+        abort(404)
+
+    path, encoding, etag = asset_path, None, match.group(1)
+    for name, suffix, etag_suffix in _MAP_ASSET_ENCODINGS:
+        encoded_path = asset_path.with_name(filename + suffix)
+        if request.accept_encodings[name] and encoded_path.is_file():
+            path, encoding, etag = encoded_path, name, etag + etag_suffix
+            break
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(path.read_bytes(), mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+def _latest_markers_asset(basename):
+    latest = None
+    for path in PLZNITO_MAP_DATA_DIR.glob(f"{basename}.*.json"):
+        match = _MAP_ASSET_RE.match(path.name)
+        if not match or path.name[:-len(match.group(1)) - 6] != basename:
+            continue
+        if latest is None or path.stat().st_mtime > latest.stat().st_mtime:
+            latest = path
+    return latest
+
+
+def _marker_index(basename):
+    asset_path = _latest_markers_asset(basename)
+    if asset_path is None:
+        return None
+    cached = _marker_indexes.get(basename)
+    if cached is None or cached[0] != asset_path.name:
+        with asset_path.open(encoding="utf-8") as f:
+            index = marker_index.MarkerGridIndex.from_payload(json.load(f))
+        cached = (asset_path.name, index)
+        _marker_indexes[basename] = cached
+    return cached[1]
+
+
+def _filter_keys(name):
+    if name not in request.args:
+        return None
+    return {key for key in request.args.getlist(name) if key}
+
+
+@app.route('/plznito/api/markers/<basename>')
+def plznito_markers_api(basename):
+    """
+    Return markers of the newest ``<basename>.<hash>.json`` asset inside a viewport.
+
+    Query params:
+      bbox      west,south,east,north (required)
+      zoom      map zoom; below the detail zoom large results come back as cells
+      time      page time filter (last_7_days, last_30_days, all_time, year:YYYY)
+      ts        generated timestamp of the page, reference for relative time filters
+      status    repeated status keys (omitted = all)
+      category  repeated category keys (omitted = all)
+
+    Response: {total, indexed, markers: [...], truncated} or {total, indexed, cells: [{lat, lon, count}]}
+    """
+    if not _MAP_ASSET_BASENAME_RE.match(basename):
+        abort(404)
+    index = _marker_index(basename)
+    if index is None:
+        abort(404)
+
+    try:
+        west, south, east, north = (float(value) for value in request.args.get("bbox", "").split(","))
+    except ValueError:
+        abort(400, description="Invalid 'bbox'. Use west,south,east,north.")
+    # float() accepts nan, inf and 1e308, which the grid index cannot map to a cell.
+    if not (all(-180 <= value <= 180 for value in (west, east))
+            and all(-90 <= value <= 90 for value in (south, north))):
+        abort(400, description="Invalid 'bbox'. Longitudes must be within ±180 and latitudes within ±90.")
+    zoom = request.args.get("zoom", type=int)
+    if zoom is not None and not 0 <= zoom <= _MARKERS_MAX_ZOOM:
+        abort(400, description="Invalid 'zoom'.")
+    generated_ts = request.args.get("ts", type=int)
+    try:
+        since_ts, year = marker_index.time_filter_bounds(request.args.get("time"), generated_ts or 0)
+    except ValueError:
+        abort(400, description="Invalid 'time' filter.")
+    if since_ts is not None and generated_ts is None:
+        abort(400, description="Relative 'time' filters need 'ts'.")
+
+    return jsonify(index.query(
+        (south, west, north, east),
+        zoom=zoom,
+        since_ts=since_ts,
+        year=year,
+        statuses=_filter_keys("status"),
+        categories=_filter_keys("category"),
+    ))
+
 @app.route('/train_delays/', methods=['GET', 'OPTIONS'])
 @cache.cached()
 def get_delays():
@@ -129,6 +325,7 @@ def get_bikecounters():
 # ── Nav API ────────────────────────────────────────────────────────────────────
  
 @app.route("/bikecounters/api/nav")
+@_generation_cached
 def api_nav():
     """Return navigation tree for the sidebar."""
     sections = {}
@@ -207,6 +404,7 @@ def api_location(loc_id):
 # ── Counts API ────────────────────────────────────────────────────────────────
  
 @app.route("/bikecounters/api/counts/<loc_id>")
+@_generation_cached
 def api_counts(loc_id):
     """
     Return aggregated counts for a location.
@@ -251,73 +449,19 @@ def api_counts(loc_id):
         except ValueError:
             abort(400, description="Invalid date value.")
 
-    allowed_resolutions = {
-        "hourly": "substr(ts, 1, 13)",  # 'YYYY-MM-DD HH'
-        "daily": "substr(ts, 1, 10)",   # 'YYYY-MM-DD'
-    }
-    if resolution not in allowed_resolutions:
+    if resolution not in counts_api.ROLLUPS:
         abort(400, description="Invalid resolution. Supported values are 'hourly' and 'daily'.")
  
-    # SQL truncation expression per resolution
-    trunc = allowed_resolutions[resolution]
- 
-    source_ids   = [c["source_id"] for c in collectors]
-    placeholders = ",".join("?" * len(source_ids))
- 
-    # Optional date filter clause
-    date_clause = ""
-    date_params = []
-    if from_date:
-        date_clause += " AND ts >= ?"
-        date_params.append(from_date)
-    if to_date:
-        # Include the full to_date day
-        date_clause += " AND ts < date(?, '+1 day')"
-        date_params.append(to_date)
- 
-    sql_combined = f"""
-        SELECT {trunc}       AS period,
-               SUM(bikes)   AS bikes,
-               SUM(scooters) AS scooters
-        FROM counts
-        WHERE source_id IN ({placeholders}) {date_clause}
-        GROUP BY period
-        ORDER BY period
-        LIMIT {_MAX_RESULT_ROWS}
-        """
-    combined_rows_raw = query(sql_combined, source_ids + date_params)
-    # rename 'period' back to 'ts' for the frontend
-    combined_rows = [{"ts": r["period"], "bikes": r["bikes"], "scooters": r["scooters"]} for r in combined_rows_raw]
+    source_ids = [c["source_id"] for c in collectors]
+    with db_pool.connection() as db:
+        combined_rows, per_col_grouped = counts_api.load_counts(
+            db, source_ids, resolution, from_date, to_date, max_periods=_MAX_RESULT_ROWS)
     import logging as _l
     if combined_rows:
         _l.getLogger(__name__).debug(
             "api_counts %s/%s: %d buckets, sample: %s",
             loc_id, resolution, len(combined_rows), combined_rows[-1])
  
-    per_col_rows = query(
-        f"""
-        SELECT source_id,
-               {trunc}       AS period,
-               SUM(bikes)   AS bikes,
-               SUM(scooters) AS scooters
-        FROM counts
-        WHERE source_id IN ({placeholders}) {date_clause}
-        GROUP BY source_id, period
-        ORDER BY source_id, period
-        LIMIT {_MAX_RESULT_ROWS}
-        """,
-        source_ids + date_params,
-    )
- 
-    per_col_grouped = {}
-    for row in per_col_rows:
-        sid = row["source_id"]
-        per_col_grouped.setdefault(sid, []).append({
-            "ts":       row["period"],
-            "bikes":    row["bikes"],
-            "scooters": row["scooters"],
-        })
- 
     collectors_out = []
     for col in collectors:
         sid = col["source_id"]
@@ -336,6 +480,7 @@ def api_counts(loc_id):
  
 # /api/daily kept as alias — frontend still calls it for initial load
 @app.route("/bikecounters/api/daily/<loc_id>")
+@_generation_cached
 def api_daily(loc_id):
     # Reuse api_counts with resolution=daily while preserving any other query params
     query_args = request.args.to_dict(flat=False)
@@ -344,11 +489,13 @@ def api_daily(loc_id):
         f"/bikecounters/api/counts/{loc_id}",
         query_string=query_args,
     ):
-        return api_counts(loc_id)
+        # Undecorated: api_daily's own cache entry already covers this body.
+        return api_counts.__wrapped__(loc_id)
  
 # ── Weather API ────────────────────────────────────────────────────────────────
  
 @app.route("/bikecounters/api/weather")
+@_generation_cached
 def api_weather():
     """Return all weather data as {date: {t, p}} JSON."""
     rows = query("SELECT date, t, p FROM weather ORDER BY date")
@@ -357,11 +504,22 @@ def api_weather():
  
 # ── Debug endpoint ────────────────────────────────────────────────────────────
  
+def _debug_api_enabled():
+    return os.getenv("BIKECOUNTERS_ENABLE_DEBUG_API", "").lower() in ("1", "true", "yes", "on")
+
+
+@app.route("/bikecounters/api/debug")
+def api_debug_pool():
+    """Show the DB connection pool counters of this worker."""
+    if not _debug_api_enabled():
+        abort(404)
+    return jsonify({"db_pool": db_pool.stats()})
+
+
 @app.route("/bikecounters/api/debug/<loc_id>")
 def api_debug(loc_id):
     """Show raw DB stats for a location — helps diagnose ingestion issues."""
-    debug_enabled = os.getenv("BIKECOUNTERS_ENABLE_DEBUG_API", "").lower() in ("1", "true", "yes", "on")
-    if not debug_enabled:
+    if not _debug_api_enabled():
         abort(404)
 
     loc = bw_cfg.LOCATION_BY_ID.get(loc_id)
@@ -1,11 +1,12 @@
 import re
 import unicodedata
 
-import requests
 from bs4 import BeautifulSoup
 
 from fake_headers import Headers
 
+from common import http_client
+
 
 TRAIN_ID_RE = re.compile(r"\b([A-Za-z]{1,6})\s*([0-9]{1,6})\b")
 TIME_RE = re.compile(r"\b([0-2]?\d:[0-5]\d)\b")
@@ -94,7 +95,7 @@ def scrape_babitron_delays(url):
     source_page = source_page_from_url(url)
 
     headers = Headers(headers=True).generate()
-    response = requests.get(url, headers=headers, timeout=30)
+    response = http_client.get(url, headers=headers, timeout=30)
     if response.status_code != 200:
         raise Exception(f"Chyba při stahování stránky: {response.status_code}")
 
@@ -0,0 +1,125 @@
+"""
+Benchmark of the /bikecounters/api/counts queries.
+
+Builds a synthetic DB of 15-minute intervals with ingest.upsert_counts and
+times one request body (query + JSON encoding) with the previous two queries
+of the rollup (combined, then per collector, rows as dicts) against the single
+scan of counts_api.load_counts, checking both return the same series.
+
+Usage:
+    python bench_api_counts.py --years 2 --collectors 4
+    python bench_api_counts.py --db cyklo.db --sources cam_29_c8,cam_29_c9
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import counts_api
+import ingest
+
+
+def load_counts_two_scans(query, source_ids, resolution, from_date=None, to_date=None, max_periods=50_000):
+    table, period, key_order = counts_api.ROLLUPS[resolution]
+    placeholders = ",".join("?" * len(source_ids))
+    clause, params = counts_api.date_filter(from_date, to_date)
+    combined = [
+        {"ts": r["period"], "bikes": r["bikes"], "scooters": r["scooters"]}
+        for r in query(
+            f"""
+            SELECT {period} AS period, SUM(bikes) AS bikes, SUM(scooters) AS scooters
+            FROM {table}
+            WHERE source_id IN ({placeholders}) {clause}
+            GROUP BY {key_order} ORDER BY {key_order} LIMIT {max_periods}
+            """,
+            list(source_ids) + params,
+        )
+    ]
+    per_collector = {}
+    for r in query(
+        f"""
+        SELECT source_id, {period} AS period, bikes, scooters
+        FROM {table}
+        WHERE source_id IN ({placeholders}) {clause}
+        ORDER BY source_id, {key_order} LIMIT {max_periods}
+        """,
+        list(source_ids) + params,
+    ):
+        per_collector.setdefault(r["source_id"], []).append(
+            {"ts": r["period"], "bikes": r["bikes"], "scooters": r["scooters"]})
+    return combined, per_collector
+
+
+def build_synthetic_db(path, years, collectors):
+    db = sqlite3.connect(path)
+    ingest.cfg.DB_PATH = path
+    ingest.init_db()
+    source_ids = [f"cam_bench_c{i}" for i in range(collectors)]
+    start = datetime.datetime(2024, 1, 1)
+    rows = []
+    for i in range(int(years * 365 * 96)):
+        ts = (start + datetime.timedelta(minutes=15 * i)).strftime("%Y-%m-%d %H:%M:%S")
+        for n, source_id in enumerate(source_ids):
+            rows.append((source_id, ts, (i * 7 + n) % 23, (i + n) % 3))
+    ingest.upsert_counts(db, rows)
+    db.commit()
+    db.close()
+    return source_ids
+
+
+def _time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=None, help="Existing cyklo.db instead of a synthetic one.")
+    parser.add_argument("--sources", type=str, default=None, help="Comma-separated source_ids for --db.")
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--collectors", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            if not args.sources:
+                raise SystemExit("--db needs --sources.")
+            db_path, source_ids = args.db, args.sources.split(",")
+        else:
+            db_path = os.path.join(tmp_dir, "cyklo.db")
+            source_ids = build_synthetic_db(db_path, args.years, args.collectors)
+
+        db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        db.row_factory = sqlite3.Row
+
+        def query(sql, params=()):
+            return [dict(r) for r in db.execute(sql, params).fetchall()]
+
+        for resolution in ("daily", "hourly"):
+            def _request(loader, source):
+                # The old per-collector LIMIT truncated long hourly ranges, so compare untruncated.
+                combined, per_collector = loader(source, source_ids, resolution, max_periods=10 ** 9)
+                return combined, per_collector, json.dumps({"combined": combined, "collectors": per_collector})
+
+            old_s, old = _time_call(lambda: _request(load_counts_two_scans, query), args.repeat)
+            new_s, new = _time_call(lambda: _request(counts_api.load_counts, db), args.repeat)
+            if old[:2] != new[:2]:
+                raise SystemExit(f"{resolution}: single scan returned different series.")
+            print(f"{resolution:<7} periods {len(new[0]):>6}   two scans {old_s * 1000:8.1f} ms"
+                  f"   one scan {new_s * 1000:8.1f} ms   {old_s / new_s:.1f}x")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
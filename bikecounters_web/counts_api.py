@@ -0,0 +1,135 @@
+"""
+counts_api.py — rollup queries behind /bikecounters/api/counts.
+
+Kept free of Flask so bench_api_counts.py can time it against a plain sqlite3
+connection; app/routes.py loads it next to config.py.
+"""
+
+# Rollup table, the 'ts' it returns and its key order per resolution, maintained by ingest.py
+ROLLUPS = {
+    "hourly": ("counts_hourly", "day || ' ' || printf('%02d', hour)", "day, hour"),  # 'YYYY-MM-DD HH'
+    "daily": ("counts_daily", "day", "day"),                                         # 'YYYY-MM-DD'
+}
+
+# First ingest schema (PRAGMA user_version) with the typed rollups above. Older
+# files are served from the raw counts until ingest.py or migrate_db.py runs.
+ROLLUP_SCHEMA_VERSION = 2
+RAW_PERIODS = {
+    "hourly": "substr(ts, 1, 13)",  # 'YYYY-MM-DD HH'
+    "daily": "substr(ts, 1, 10)",   # 'YYYY-MM-DD'
+}
+
+
+def date_filter(from_date=None, to_date=None):
+    """Return the ``AND ...`` clause and params for an inclusive YYYY-MM-DD range."""
+    clause = ""
+    params = []
+    if from_date:
+        clause += " AND day >= ?"
+        params.append(from_date)
+    if to_date:
+        clause += " AND day <= ?"
+        params.append(to_date)
+    return clause, params
+
+
+def counts_query(source_id, resolution, from_date=None, to_date=None, limit=None):
+    """
+    Return the ``(sql, params)`` reading one source's rollup rows, a primary key
+    range, optionally only its first ``limit`` periods.
+    """
+    table, period, key_order = ROLLUPS[resolution]
+    clause, params = date_filter(from_date, to_date)
+    sql = f"""
+        SELECT {period} AS period,
+               bikes,
+               scooters
+        FROM {table}
+        WHERE source_id = ? {clause}
+        ORDER BY {key_order}
+        """
+    params = [source_id] + params
+    if limit is not None:
+        sql += "LIMIT ?\n"
+        params.append(limit)
+    return sql, params
+
+
+def raw_counts_query(source_id, resolution, from_date=None, to_date=None, limit=None):
+    """Return the ``(sql, params)`` of counts_query summed from the raw ``counts`` rows."""
+    period = RAW_PERIODS[resolution]
+    clause = ""
+    params = [source_id]
+    if from_date:
+        clause += " AND ts >= ?"
+        params.append(from_date)
+    if to_date:
+        # Include the full to_date day
+        clause += " AND ts < date(?, '+1 day')"
+        params.append(to_date)
+    sql = f"""
+        SELECT {period} AS period,
+               SUM(bikes) AS bikes,
+               SUM(scooters) AS scooters
+        FROM counts
+        WHERE source_id = ? {clause}
+        GROUP BY period
+        ORDER BY period
+        """
+    if limit is not None:
+        sql += "LIMIT ?\n"
+        params.append(limit)
+    return sql, params
+
+
+def has_rollups(db):
+    """Return True when ``db`` is at a schema whose rollups counts_query can read."""
+    return db.execute("PRAGMA user_version").fetchone()[0] >= ROLLUP_SCHEMA_VERSION
+
+
+def load_counts(db, source_ids, resolution, from_date=None, to_date=None, max_periods=50_000):
+    """
+    Return ``(combined, per_collector)`` series for ``source_ids``.
+
+    Each source's rollup rows are read once, in primary key order, and feed both
+    results: a row is appended to its collector's series and added to the
+    combined total of its period. Querying per source instead of with IN (...)
+    saves returning source_id on every row. ``combined`` is a list of
+    ``{ts, bikes, scooters}`` with at most ``max_periods`` periods,
+    ``per_collector`` maps source_id to such a list over the same periods.
+    ``db`` is a sqlite3 connection.
+
+    A source has at most one row per period, so its rows within the first
+    ``max_periods`` combined periods are among its first ``max_periods`` rows:
+    each query stops there in SQL instead of reading the whole range.
+
+    A DB older than ROLLUP_SCHEMA_VERSION (new app code deployed before the
+    migration) is summed from the raw counts instead.
+    """
+    make_query = counts_query if has_rollups(db) else raw_counts_query
+    cursor = db.cursor()
+    cursor.row_factory = None  # plain tuples, the series dicts are built below anyway
+    per_collector = {}
+    totals = {}
+    for source_id in dict.fromkeys(source_ids):
+        series = []
+        for ts, bikes, scooters in cursor.execute(
+                *make_query(source_id, resolution, from_date, to_date, limit=max_periods)):
+            series.append({"ts": ts, "bikes": bikes, "scooters": scooters})
+            total = totals.get(ts)
+            if total is None:
+                totals[ts] = [bikes, scooters]
+            else:
+                total[0] += bikes
+                total[1] += scooters
+        if series:
+            per_collector[source_id] = series
+
+    periods = sorted(totals)
+    if len(periods) > max_periods:
+        periods = periods[:max_periods]
+        last = periods[-1]
+        for source_id, series in per_collector.items():
+            per_collector[source_id] = [point for point in series if point["ts"] <= last]
+    combined = [{"ts": ts, "bikes": totals[ts][0], "scooters": totals[ts][1]} for ts in periods]
+    return combined, per_collector
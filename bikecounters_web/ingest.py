@@ -8,6 +8,7 @@ Usage:
     python3 ingest.py --delete-cache    # force re-download of ČHMÚ historical CSVs
     python3 ingest.py --source eco      # only eco-counter
     python3 ingest.py --source cam      # only cameras
+    python3 ingest.py --rebuild-rollups # recompute counts_hourly/counts_daily
 """
 
 import argparse
@@ -17,11 +18,13 @@ import logging
 import sqlite3
 import sys
 import time
-from datetime import date as dt_date, datetime
+from datetime import date as dt_date
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(1, str(Path(__file__).resolve().parent.parent))
 import config as cfg
+from common.dates import DateParser
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +33,9 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
+# Camera intervals repeat for every collector, so parsed timestamps are memoized.
+CAMERA_TS_PARSER = DateParser(("%d.%m.%Y %H:%M",))
+
 # ── Database ───────────────────────────────────────────────────────────────────
 
 def get_db():
@@ -37,38 +43,198 @@ def get_db():
     db.execute("PRAGMA journal_mode=WAL")
     return db
 
+# Bumped with every layout change; init_db() migrates older files (PRAGMA user_version).
+SCHEMA_VERSION = 3
+
+# counts keeps the raw ts as key and the typed day ('YYYY-MM-DD') and hour (0-23)
+# next to it, so the covering index serves rollup refreshes without touching rows.
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS counts (
+        source_id   TEXT NOT NULL,
+        ts          TEXT NOT NULL,
+        day         TEXT NOT NULL,
+        hour        INTEGER NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, ts)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_counts_day_hour
+        ON counts(source_id, day, hour, bikes, scooters)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS weather (
+        date TEXT PRIMARY KEY,
+        t    REAL,
+        p    REAL
+    )
+    """,
+    # Data generation the API derives ETags and its response cache keys from
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key     TEXT PRIMARY KEY,
+        value   INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    # Rollups of counts read by the API
+    """
+    CREATE TABLE IF NOT EXISTS counts_hourly (
+        source_id   TEXT NOT NULL,
+        day         TEXT NOT NULL,
+        hour        INTEGER NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, day, hour)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS counts_daily (
+        source_id   TEXT NOT NULL,
+        day         TEXT NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, day)
+    ) WITHOUT ROWID
+    """,
+)
+
+HOURLY_REFRESH_SQL = """
+    INSERT OR REPLACE INTO counts_hourly(source_id, day, hour, bikes, scooters)
+    SELECT ?1, ?2, ?3, SUM(bikes), SUM(scooters)
+    FROM counts WHERE source_id = ?1 AND day = ?2 AND hour = ?3
+"""
+DAILY_REFRESH_SQL = """
+    INSERT OR REPLACE INTO counts_daily(source_id, day, bikes, scooters)
+    SELECT ?1, ?2, SUM(bikes), SUM(scooters)
+    FROM counts_hourly WHERE source_id = ?1 AND day = ?2
+"""
+HOURLY_REBUILD_SQL = """
+    INSERT INTO counts_hourly(source_id, day, hour, bikes, scooters)
+    SELECT source_id, day, hour, SUM(bikes), SUM(scooters)
+    FROM counts GROUP BY source_id, day, hour
+"""
+DAILY_REBUILD_SQL = """
+    INSERT INTO counts_daily(source_id, day, bikes, scooters)
+    SELECT source_id, day, SUM(bikes), SUM(scooters)
+    FROM counts_hourly GROUP BY source_id, day
+"""
+
+def bump_generation(db):
+    """Advance the data generation; call inside the transaction that changed the data."""
+    db.execute("""
+        INSERT INTO meta(key, value) VALUES('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """)
+    db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES('updated_at', CAST(strftime('%s', 'now') AS INTEGER))")
+
+def ts_day(ts):
+    return ts[:10]
+
+def ts_hour(ts):
+    """Hour of a 'YYYY-MM-DD HH:MM:SS' (or 'T'-separated) timestamp, 0 when it has none."""
+    hour = ts[11:13]
+    return int(hour) if hour.isdigit() else 0
+
+def _table_columns(db, table):
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+def migrate_db(db):
+    """
+    Create the tables or bring an older DB to SCHEMA_VERSION in one transaction.
+
+    Version 1 files (TEXT ts with a substr(ts, 1, 10) index and TEXT rollup
+    keys) get counts copied into the typed WITHOUT ROWID layout and the rollups
+    rebuilt; version 2 files only gain the meta table. Every migration starts a
+    new data generation. Returns True when existing counts were migrated.
+    """
+    if db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    started = time.monotonic()
+    db.execute("BEGIN")
+    try:
+        tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        legacy_counts = "counts" in tables and "day" not in _table_columns(db, "counts")
+        if legacy_counts:
+            db.execute("DROP INDEX IF EXISTS idx_counts_date")
+            db.execute("ALTER TABLE counts RENAME TO counts_v1")
+            # Rollups keyed by TEXT hour buckets are rebuilt below.
+            db.execute("DROP TABLE IF EXISTS counts_hourly")
+            db.execute("DROP TABLE IF EXISTS counts_daily")
+        for statement in SCHEMA:
+            db.execute(statement)
+        if legacy_counts:
+            db.create_function("ts_day", 1, ts_day, deterministic=True)
+            db.create_function("ts_hour", 1, ts_hour, deterministic=True)
+            db.execute("""
+                INSERT INTO counts(source_id, ts, day, hour, bikes, scooters)
+                SELECT source_id, ts, ts_day(ts), ts_hour(ts), bikes, scooters FROM counts_v1
+            """)
+            db.execute("DROP TABLE counts_v1")
+            rebuild_rollups(db)
+        bump_generation(db)
+        db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    if legacy_counts:
+        log.info("Migrated counts to schema v%d: %d rows in %.1f s", SCHEMA_VERSION,
+                 db.execute("SELECT COUNT(*) FROM counts").fetchone()[0], time.monotonic() - started)
+    return legacy_counts
+
 def init_db():
     db = get_db()
-    db.executescript("""
-        CREATE TABLE IF NOT EXISTS counts (
-            source_id   TEXT NOT NULL,
-            ts          TEXT NOT NULL,
-            bikes       INTEGER NOT NULL DEFAULT 0,
-            scooters    INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (source_id, ts)
-        );
-        CREATE INDEX IF NOT EXISTS idx_counts_date
-            ON counts(source_id, substr(ts, 1, 10));
-
-        CREATE TABLE IF NOT EXISTS weather (
-            date TEXT PRIMARY KEY,
-            t    REAL,
-            p    REAL
-        );
-    """)
-    db.commit()
+    migrate_db(db)
     db.close()
     log.info("DB initialised at %s", cfg.DB_PATH)
 
+def rebuild_rollups(db):
+    """Recompute counts_hourly and counts_daily from all of counts."""
+    db.execute("DELETE FROM counts_hourly")
+    db.execute("DELETE FROM counts_daily")
+    db.execute(HOURLY_REBUILD_SQL)
+    db.execute(DAILY_REBUILD_SQL)
+    bump_generation(db)
+    log.info("Rollups rebuilt: %d hourly, %d daily buckets",
+             db.execute("SELECT COUNT(*) FROM counts_hourly").fetchone()[0],
+             db.execute("SELECT COUNT(*) FROM counts_daily").fetchone()[0])
+
+def upsert_counts(db, rows):
+    """
+    Upsert (source_id, ts, bikes, scooters) rows and refresh the rollups they touch.
+
+    Only the hour and day buckets of the given rows are recomputed, each by a
+    seek on idx_counts_day_hour or the counts_hourly key, and the data
+    generation advances. The caller commits, so the API sees counts, rollups and
+    generation change together.
+    """
+    if not rows:
+        return
+    typed_rows = [(source_id, ts, ts_day(ts), ts_hour(ts), bikes, scooters)
+                  for source_id, ts, bikes, scooters in rows]
+    db.executemany(
+        "INSERT OR REPLACE INTO counts(source_id, ts, day, hour, bikes, scooters) VALUES(?,?,?,?,?,?)",
+        typed_rows,
+    )
+    hours = sorted({(row[0], row[2], row[3]) for row in typed_rows})
+    days = sorted({(source_id, day) for source_id, day, _ in hours})
+    # Upserts never remove counts rows, so every touched bucket is non-empty.
+    db.executemany(HOURLY_REFRESH_SQL, hours)
+    db.executemany(DAILY_REFRESH_SQL, days)
+    bump_generation(db)
+    log.debug("  Rollups refreshed: %d hourly, %d daily buckets", len(hours), len(days))
+
 # ── HTTP helper ────────────────────────────────────────────────────────────────
 
 def fetch(url, timeout=60, encoding=None) -> str:
     try:
-        import requests
+        from common import http_client
     except ImportError:
         log.error("pip install requests")
         sys.exit(1)
-    r = requests.get(url, timeout=timeout)
+    r = http_client.get(url, timeout=timeout)
     r.raise_for_status()
     if encoding:
         return r.content.decode(encoding)
@@ -128,10 +294,7 @@ def ingest_ecocounter():
         rows_out.append((f"eco_{site_id}_out", ts, bo, so))
 
     db = get_db()
-    db.executemany(
-        "INSERT OR REPLACE INTO counts(source_id, ts, bikes, scooters) VALUES(?,?,?,?)",
-        rows_in + rows_out,
-    )
+    upsert_counts(db, rows_in + rows_out)
     db.commit()
     db.close()
     if rows_in:
@@ -202,14 +365,11 @@ def _parse_camera_csv(text: str, cam_id: str) -> list[tuple]:
             continue
 
         # Parse Czech date format: "30.6.2025 23:58" → "2025-06-30 23:58:00"
-        try:
-            dt = datetime.strptime(ts_raw, "%d.%m.%Y %H:%M")
+        dt = CAMERA_TS_PARSER.parse(ts_raw)
+        if dt is not None:
             ts = dt.strftime("%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            try:
-                ts = ts_raw.replace("T", " ")[:19]
-            except Exception:
-                continue
+        else:
+            ts = ts_raw.replace("T", " ")[:19]
 
         source_id = f"cam_{cam_id}_c{coll_id}"
         rows.append((source_id, ts, bikes, scoot))
@@ -230,10 +390,7 @@ def ingest_camera(cam_id: str, name: str):
         return
 
     db = get_db()
-    db.executemany(
-        "INSERT OR REPLACE INTO counts(source_id, ts, bikes, scooters) VALUES(?,?,?,?)",
-        rows,
-    )
+    upsert_counts(db, rows)
     db.commit()
 
     # Auto-discover collectors not yet in config
@@ -348,7 +505,7 @@ def _chmi_parse_recent_json(data) -> dict:
 
 def ingest_weather(delete_cache=False):
     try:
-        import requests
+        from common import http_client
     except ImportError:
         log.warning("requests not available, skipping weather")
         return
@@ -374,8 +531,7 @@ def ingest_weather(delete_cache=False):
         else:
             log.info("ČHMÚ %s → %s", var, url)
             try:
-                import requests as req
-                r = req.get(url, timeout=120)
+                r = http_client.get(url, timeout=120)
                 r.raise_for_status()
                 text = r.content.decode("utf-8-sig")
                 cache_file.write_text(text, encoding="utf-8")
@@ -389,7 +545,6 @@ def ingest_weather(delete_cache=False):
         log.info("  %s: %d total days", var, len(parsed))
 
     # ── 2. Recent monthly JSON ────────────────────────────────────────────────
-    import requests as req
     today = dt_date.today()
     # Fetch from 2 months back to catch gap between historical and now
     start_dt = dt_date(today.year, today.month, 1)
@@ -407,7 +562,7 @@ def ingest_weather(delete_cache=False):
         ]
         for url in candidates:
             try:
-                r = req.get(url, timeout=30)
+                r = http_client.get(url, timeout=30)
                 if r.status_code == 404: continue
                 r.raise_for_status()
                 parsed = _chmi_parse_recent_json(r.json())
@@ -431,6 +586,7 @@ def ingest_weather(delete_cache=False):
 
     db = get_db()
     db.executemany("INSERT OR REPLACE INTO weather(date, t, p) VALUES(?,?,?)", rows)
+    bump_generation(db)
     db.commit()
     db.close()
     log.info("Weather: %d days upserted", len(rows))
@@ -442,10 +598,18 @@ def main():
     parser.add_argument("--no-weather",   action="store_true")
     parser.add_argument("--delete-cache", action="store_true")
     parser.add_argument("--source", choices=["eco", "cam", "weather", "all"], default="all")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Recompute counts_hourly/counts_daily, e.g. after inserting into counts by hand.")
     args = parser.parse_args()
 
     init_db()
 
+    if args.rebuild_rollups:
+        db = get_db()
+        rebuild_rollups(db)
+        db.commit()
+        db.close()
+
     if args.source in ("all", "eco"):
         ingest_ecocounter()
 
@@ -461,6 +625,16 @@ def main():
     if args.source in ("all", "weather") and not args.no_weather:
         ingest_weather(delete_cache=args.delete_cache)
 
+    try:
+        from common import http_client
+    except ImportError:
+        pass
+    else:
+        http_client.log_stats(log)
+    CAMERA_TS_PARSER.log_stats(log, "camera timestamps")
+    db = get_db()
+    log.info("Data generation: %s", db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0])
+    db.close()
     log.info("Done ✓")
 
 if __name__ == "__main__":
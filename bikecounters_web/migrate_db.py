@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+migrate_db.py — bring an existing cyklo.db to the current schema and check its query plans.
+
+ingest.py migrates on its next run anyway; this tool does it up front (optionally
+after a backup) and verifies with EXPLAIN QUERY PLAN that the API and rollup
+statements are index seeks or ordered scans, never temp B-tree sorts.
+
+Usage:
+    python3 migrate_db.py                        # migrate config.DB_PATH
+    python3 migrate_db.py --db cyklo.db --backup cyklo.v1.db
+    python3 migrate_db.py --check                # only verify the query plans
+"""
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import config as cfg
+import counts_api
+import ingest
+
+# (name, statement, sample params, prefix every plan row must start with)
+_SAMPLE_SOURCE = "eco_0_in"
+_SAMPLE_RANGE = ("2025-01-01", "2025-01-31")
+PLAN_CHECKS = [
+    *(
+        (f"api {resolution}{' range' if dates[0] else ''}",
+         *counts_api.counts_query(_SAMPLE_SOURCE, resolution, *dates),
+         f"SEARCH {counts_api.ROLLUPS[resolution][0]} USING PRIMARY KEY")
+        for resolution in counts_api.ROLLUPS
+        for dates in ((None, None), _SAMPLE_RANGE)
+    ),
+    ("hourly refresh", ingest.HOURLY_REFRESH_SQL, (_SAMPLE_SOURCE, _SAMPLE_RANGE[0], 8),
+     "SEARCH counts USING COVERING INDEX idx_counts_day_hour"),
+    ("daily refresh", ingest.DAILY_REFRESH_SQL, (_SAMPLE_SOURCE, _SAMPLE_RANGE[0]),
+     "SEARCH counts_hourly USING PRIMARY KEY"),
+    ("hourly rebuild", ingest.HOURLY_REBUILD_SQL, (), "SCAN counts USING COVERING INDEX idx_counts_day_hour"),
+    ("daily rebuild", ingest.DAILY_REBUILD_SQL, (), "SCAN counts_hourly"),
+]
+
+
+def check_query_plans(db):
+    """Log the plan of every PLAN_CHECKS statement and return the names that fail it."""
+    failed = []
+    for name, sql, params, expected in PLAN_CHECKS:
+        details = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        ok = bool(details) and all(d.startswith(expected) and "TEMP B-TREE" not in d for d in details)
+        ingest.log.info("%-4s %-20s %s", "ok" if ok else "FAIL", name, " | ".join(details))
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=str(cfg.DB_PATH))
+    parser.add_argument("--backup", type=str, default=None, help="Copy the DB here before migrating.")
+    parser.add_argument("--check", action="store_true", help="Only verify the query plans, do not migrate.")
+    args = parser.parse_args()
+
+    if not Path(args.db).is_file():
+        raise SystemExit(f"{args.db} does not exist.")
+    db = sqlite3.connect(args.db)
+    if args.check:
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if version < ingest.SCHEMA_VERSION:
+            raise SystemExit(f"{args.db} is at schema v{version}, run without --check to migrate it first.")
+    else:
+        if args.backup:
+            backup = sqlite3.connect(args.backup)
+            db.backup(backup)
+            backup.close()
+            ingest.log.info("Backed up %s to %s", args.db, args.backup)
+        db.execute("PRAGMA journal_mode=WAL")
+        if not ingest.migrate_db(db):
+            ingest.log.info("%s is already at schema v%d", args.db, ingest.SCHEMA_VERSION)
+
+    failed = check_query_plans(db)
+    db.close()
+    if failed:
+        raise SystemExit(f"Unexpected query plans: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+test_migrate_db.py — schema migration and query plan checks of cyklo.db.
+
+Run from the repo root with ``python -m pytest bikecounters_web``.
+"""
+
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+import counts_api
+import ingest
+import migrate_db
+
+SOURCES = ["eco_0_in", "eco_0_out", "cam_1_c1"]
+
+# cyklo.db as written by ingest.py before schema versions (PRAGMA user_version 0)
+V1_SCHEMA = """
+    CREATE TABLE counts (
+        source_id   TEXT NOT NULL,
+        ts          TEXT NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, ts)
+    );
+    CREATE INDEX idx_counts_date ON counts(source_id, substr(ts, 1, 10));
+    CREATE TABLE weather (date TEXT PRIMARY KEY, t REAL, p REAL);
+    CREATE TABLE counts_hourly (
+        source_id   TEXT NOT NULL,
+        hour        TEXT NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, hour)
+    );
+    CREATE TABLE counts_daily (
+        source_id   TEXT NOT NULL,
+        day         TEXT NOT NULL,
+        bikes       INTEGER NOT NULL DEFAULT 0,
+        scooters    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_id, day)
+    );
+    INSERT INTO weather VALUES ('2025-01-01', 1.5, 0.0);
+"""
+V1_ROLLUPS = """
+    INSERT INTO counts_hourly(source_id, hour, bikes, scooters)
+    SELECT source_id, substr(ts, 1, 13), SUM(bikes), SUM(scooters)
+    FROM counts GROUP BY source_id, substr(ts, 1, 13);
+    INSERT INTO counts_daily(source_id, day, bikes, scooters)
+    SELECT source_id, substr(hour, 1, 10), SUM(bikes), SUM(scooters)
+    FROM counts_hourly GROUP BY source_id, substr(hour, 1, 10);
+"""
+
+
+def _sample_rows(count=5000, seed=7):
+    rng = random.Random(seed)
+    rows = {}
+    for _ in range(count):
+        source_id = rng.choice(SOURCES)
+        ts = (f"2025-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d} "
+              f"{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}:00")
+        rows[source_id, ts] = (rng.randint(0, 30), rng.randint(0, 3))
+    return [(source_id, ts, bikes, scooters) for (source_id, ts), (bikes, scooters) in rows.items()]
+
+
+def _table_totals(db, table):
+    return db.execute(f"SELECT COUNT(*), SUM(bikes), SUM(scooters) FROM {table}").fetchone()
+
+
+def _per_source_sums(db, table):
+    return db.execute(
+        f"SELECT source_id, SUM(bikes), SUM(scooters) FROM {table} GROUP BY source_id ORDER BY source_id"
+    ).fetchall()
+
+
+def _series(db):
+    return {
+        (resolution, dates): counts_api.load_counts(db, SOURCES, resolution, *dates)
+        for resolution in counts_api.ROLLUPS
+        for dates in ((None, None), ("2025-02-01", "2025-02-10"))
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "cyklo.db"
+    monkeypatch.setattr(ingest.cfg, "DB_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def v1_db(db_path):
+    db = sqlite3.connect(db_path)
+    db.executescript(V1_SCHEMA)
+    db.executemany("INSERT INTO counts VALUES (?, ?, ?, ?)", _sample_rows())
+    db.executescript(V1_ROLLUPS)
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("name, sql, params, expected", migrate_db.PLAN_CHECKS,
+                         ids=[check[0] for check in migrate_db.PLAN_CHECKS])
+def test_query_plan(db_path, name, sql, params, expected):
+    ingest.init_db()
+    db = sqlite3.connect(db_path)
+    details = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    db.close()
+
+    assert details
+    for detail in details:
+        assert detail.startswith(expected)
+        assert "TEMP B-TREE" not in detail
+
+
+def test_migrate_v1(v1_db):
+    counts_before = _table_totals(v1_db, "counts")
+    hourly_before = _table_totals(v1_db, "counts_hourly")
+    daily_before = _table_totals(v1_db, "counts_daily")
+    sums_before = _per_source_sums(v1_db, "counts")
+    series_before = _series(v1_db)
+    assert v1_db.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    assert ingest.migrate_db(v1_db) is True
+
+    assert v1_db.execute("PRAGMA user_version").fetchone()[0] == ingest.SCHEMA_VERSION
+    assert _table_totals(v1_db, "counts") == counts_before
+    assert _table_totals(v1_db, "counts_hourly") == hourly_before
+    assert _table_totals(v1_db, "counts_daily") == daily_before
+    assert _per_source_sums(v1_db, "counts_hourly") == sums_before
+    assert _per_source_sums(v1_db, "counts_daily") == sums_before
+    assert v1_db.execute("SELECT * FROM weather").fetchall() == [("2025-01-01", 1.5, 0.0)]
+    assert v1_db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone() is not None
+    # Before: summed from the raw counts, after: read from the new rollups.
+    assert _series(v1_db) == series_before
+    assert migrate_db.check_query_plans(v1_db) == []
+
+
+def test_migrate_current_is_noop(db_path):
+    ingest.init_db()
+    db = sqlite3.connect(db_path)
+    ingest.upsert_counts(db, _sample_rows(count=100))
+    db.commit()
+    totals = _table_totals(db, "counts_hourly")
+
+    assert ingest.migrate_db(db) is False
+    assert _table_totals(db, "counts_hourly") == totals
+    db.close()
@@ -0,0 +1 @@
+"""Helpers shared by the plznito, bikecounters and train delays modules."""
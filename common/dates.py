@@ -0,0 +1,130 @@
+"""
+dates.py — Memoized datetime parsing for scraped and downloaded timestamps.
+
+``DateParser(formats).parse(text)`` returns the same result as trying
+``datetime.strptime(text, fmt)`` for each format in order, but:
+
+* only formats whose shape matches the text are tried, so a miss does not cost an
+  exception per format;
+* zero-padded ``YYYY-MM-DD[ HH:MM[:SS[.ffffff]]]`` strings use ``datetime.fromisoformat``;
+* results are kept in a bounded LRU cache keyed by the raw string;
+* counters record which format (or the ISO fast path) parsed each distinct string.
+"""
+
+import datetime
+import functools
+import logging
+import re
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE_DEFAULT = 65536
+ISO_FAST_PATH = "iso"
+UNPARSED = "unparsed"
+
+# strptime accepts 1-2 digits for most numeric directives and any whitespace run
+# for a space; directives not listed here disable sniffing for their format.
+_DIRECTIVE_PATTERNS = {
+    "Y": r"\d{4}",
+    "m": r"\d{1,2}",
+    "d": r"(?:\d{1,2}| \d)",
+    "H": r"\d{1,2}",
+    "M": r"\d{1,2}",
+    "S": r"\d{1,2}",
+    "f": r"\d{1,6}",
+    "%": "%",
+}
+# Formats fromisoformat parses exactly like strptime when the text is zero padded.
+_ISO_FORMATS = {
+    "%Y-%m-%d": re.compile(r"^\d{4}-\d{2}-\d{2}$"),
+    "%Y-%m-%d %H:%M": re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$"),
+    "%Y-%m-%d %H:%M:%S": re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$"),
+    "%Y-%m-%d %H:%M:%S.%f": re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{1,6}$"),
+}
+
+
+def _shape_regex(fmt):
+    """Compile the strings strptime could accept for ``fmt``, or None when unknown."""
+    parts = []
+    index = 0
+    while index < len(fmt):
+        char = fmt[index]
+        if char == "%":
+            pattern = _DIRECTIVE_PATTERNS.get(fmt[index + 1:index + 2])
+            if pattern is None:
+                return None
+            parts.append(pattern)
+            index += 2
+            continue
+        parts.append(r"\s+" if char.isspace() else re.escape(char))
+        index += 1
+    return re.compile("^" + "".join(parts) + "$")
+
+
+class DateParser:
+    """Format-sniffing, memoized ``strptime`` over an ordered list of formats."""
+
+    def __init__(self, formats, cache_size=CACHE_SIZE_DEFAULT):
+        self.formats = tuple(formats)
+        self._candidates = [(fmt, _shape_regex(fmt), _ISO_FORMATS.get(fmt)) for fmt in self.formats]
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._parse_cached = functools.lru_cache(maxsize=cache_size)(self._parse_uncached)
+
+    def _parse_uncached(self, text):
+        for fmt, shape, iso_shape in self._candidates:
+            if shape is not None and not shape.match(text):
+                continue
+            if iso_shape is not None and iso_shape.match(text):
+                try:
+                    parsed = datetime.datetime.fromisoformat(text)
+                except ValueError:
+                    pass  # older Pythons only take 3 or 6 fraction digits; strptime decides
+                else:
+                    self._count(ISO_FAST_PATH)
+                    return parsed
+            try:
+                parsed = datetime.datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            self._count(fmt)
+            return parsed
+        self._count(UNPARSED)
+        return None
+
+    def _count(self, key):
+        with self._counts_lock:
+            self._counts[key] += 1
+
+    def parse(self, text):
+        """Return the datetime for ``text`` or None when no format matches."""
+        return self._parse_cached(text)
+
+    def stats(self):
+        """Return ``{"formats": {format/iso/unparsed: distinct strings}, "cache": {...}}``."""
+        info = self._parse_cached.cache_info()
+        with self._counts_lock:
+            formats = dict(self._counts)
+        return {
+            "formats": formats,
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize},
+        }
+
+    def clear(self):
+        self._parse_cached.cache_clear()
+        with self._counts_lock:
+            self._counts.clear()
+
+    def log_stats(self, log=logger, name="dates"):
+        stats = self.stats()
+        cache = stats["cache"]
+        lookups = cache["hits"] + cache["misses"]
+        log.info(
+            "Date parsing (%s): %d lookups, cache hit rate %.1f%%, formats %s.",
+            name,
+            lookups,
+            100.0 * cache["hits"] / lookups if lookups else 0.0,
+            ", ".join(f"{fmt!r}={count}" for fmt, count in sorted(stats["formats"].items())) or "-",
+        )
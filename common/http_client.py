@@ -0,0 +1,148 @@
+"""
+http_client.py — Shared HTTP layer for all scrapers.
+
+One keep-alive ``requests.Session`` per host (shared by all threads) with retries and
+exponential backoff on connection errors and 429/5xx responses, plus per-host
+request timing counters.
+
+Tuning via environment:
+    HTTP_RETRIES          retry attempts per request (default 3)
+    HTTP_BACKOFF_FACTOR   backoff base in seconds: sleeps 0, 2x, 4x, ... (default 0.5)
+    HTTP_POOL_MAXSIZE     keep-alive connections per host (default 16)
+"""
+
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name, default, cast):
+    value = (os.getenv(name) or "").strip()
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        return default
+
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRIES_DEFAULT = _env_number("HTTP_RETRIES", 3, int)
+BACKOFF_FACTOR_DEFAULT = _env_number("HTTP_BACKOFF_FACTOR", 0.5, float)
+POOL_MAXSIZE_DEFAULT = _env_number("HTTP_POOL_MAXSIZE", 16, int)
+
+_settings = {
+    "retries": RETRIES_DEFAULT,
+    "backoff_factor": BACKOFF_FACTOR_DEFAULT,
+    "pool_maxsize": POOL_MAXSIZE_DEFAULT,
+}
+_sessions = {}
+_sessions_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def configure(retries=None, backoff_factor=None, pool_maxsize=None):
+    """Change retry/pool settings. Existing sessions are closed and rebuilt lazily."""
+    with _sessions_lock:
+        if retries is not None:
+            _settings["retries"] = max(int(retries), 0)
+        if backoff_factor is not None:
+            _settings["backoff_factor"] = max(float(backoff_factor), 0.0)
+        if pool_maxsize is not None:
+            _settings["pool_maxsize"] = max(int(pool_maxsize), 1)
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _build_session():
+    retries = _settings["retries"]
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=_settings["backoff_factor"],
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=_settings["pool_maxsize"])
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(url):
+    """Return the pooled session for the host of ``url``."""
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _build_session()
+            _sessions[host] = session
+        return session
+
+
+def _record(host, elapsed, error):
+    with _stats_lock:
+        host_stats = _stats.get(host)
+        if host_stats is None:
+            host_stats = {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            _stats[host] = host_stats
+        host_stats["requests"] += 1
+        host_stats["errors"] += int(error)
+        host_stats["total_seconds"] += elapsed
+        host_stats["max_seconds"] = max(host_stats["max_seconds"], elapsed)
+
+
+def get(url, timeout=30, **kwargs):
+    """``requests.get`` through the pooled session of the target host."""
+    host = urlsplit(url).netloc
+    started = time.perf_counter()
+    try:
+        response = get_session(url).get(url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        _record(host, time.perf_counter() - started, error=True)
+        raise
+    _record(host, time.perf_counter() - started, error=response.status_code >= 400)
+    return response
+
+
+def stats():
+    """Return a copy of the per-host counters: {host: {requests, errors, total_seconds, max_seconds}}."""
+    with _stats_lock:
+        return {host: dict(host_stats) for host, host_stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def log_stats(log=logger):
+    for host, host_stats in sorted(stats().items()):
+        requests_count = host_stats["requests"]
+        log.info(
+            "HTTP %s: %d requests, %d errors, total %.2fs, avg %.3fs, max %.3fs",
+            host,
+            requests_count,
+            host_stats["errors"],
+            host_stats["total_seconds"],
+            host_stats["total_seconds"] / requests_count if requests_count else 0.0,
+            host_stats["max_seconds"],
+        )
@@ -0,0 +1,106 @@
+"""
+Benchmark of the map page minifier.
+
+Compares the previous regex/placeholder implementation with
+run_map_render.write_minified_html on a rendered (unminified) map page and checks
+both produce the same output.
+
+Usage:
+    python bench_minify_html.py --count 100000 --popup_mode full
+    python bench_minify_html.py --html page.html
+"""
+
+import argparse
+import datetime
+import io
+import os
+import re
+import tempfile
+import time
+
+from bench_serialize_map_data import build_synthetic_tickets
+from run_map_render import _build_map_html, serialize_map_data, write_minified_html
+
+
+def minify_html_legacy(html_text):
+    block_pattern = re.compile(r"(?is)<(script|style|pre|textarea)\b.*?</\1>")
+    preserved_blocks = []
+
+    def _preserve_block(match):
+        block_id = len(preserved_blocks)
+        preserved_blocks.append(match.group(0))
+        return f"__HTML_MINIFY_BLOCK_{block_id}__"
+
+    minified = block_pattern.sub(_preserve_block, html_text)
+    minified = re.sub(r"<!--(?!\s*\[if).*?-->", "", minified, flags=re.DOTALL)
+    minified = re.sub(r">\s+<", "><", minified)
+    minified = minified.strip()
+
+    for block_id, block_text in enumerate(preserved_blocks):
+        minified = minified.replace(f"__HTML_MINIFY_BLOCK_{block_id}__", block_text)
+
+    return minified
+
+
+def _time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _minify_to_file(html_text, path):
+    with open(path, "w", encoding="utf-8") as fw:
+        write_minified_html(fw, html_text)
+
+
+def _legacy_to_file(html_text, path):
+    with open(path, "w", encoding="utf-8") as fw:
+        fw.write(minify_html_legacy(html_text))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--html", type=str, default=None, help="Page to minify instead of a synthetic map.")
+    parser.add_argument("--count", type=int, default=100000, help="Synthetic tickets in the map page.")
+    parser.add_argument("--popup_mode", type=str, default="full", choices=["compact", "full"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.html:
+        with open(args.html, encoding="utf-8") as fr:
+            html_text = fr.read()
+    else:
+        now = datetime.datetime.now()
+        tickets = build_synthetic_tickets(args.count, now)
+        html_text = _build_map_html(serialize_map_data(tickets, popup_mode=args.popup_mode, now=now))
+
+    def _streaming():
+        output = io.StringIO()
+        write_minified_html(output, html_text)
+        return output.getvalue()
+
+    legacy_s, legacy_result = _time_call(lambda: minify_html_legacy(html_text), args.repeat)
+    stream_s, stream_result = _time_call(_streaming, args.repeat)
+    if legacy_result != stream_result:
+        raise SystemExit("Streaming minifier returned different output.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_path = os.path.join(tmp_dir, "page.html")
+        legacy_file_s, _ = _time_call(lambda: _legacy_to_file(html_text, out_path), args.repeat)
+        stream_file_s, _ = _time_call(lambda: _minify_to_file(html_text, out_path), args.repeat)
+
+    print(f"page:            {len(html_text) / 1e6:.1f} MB -> {len(stream_result) / 1e6:.1f} MB")
+    print(f"legacy:          {legacy_s * 1000:.1f} ms")
+    print(f"streaming:       {stream_s * 1000:.1f} ms")
+    print(f"legacy to file:  {legacy_file_s * 1000:.1f} ms")
+    print(f"stream to file:  {stream_file_s * 1000:.1f} ms")
+    print(f"speedup to file: {legacy_file_s / stream_file_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the ``var locations`` parser used by the map scraper.
+
+Compares the previous regex + json5 extraction with restore_all._parse_locations_from_html
+and checks both return the same records.
+
+Usage:
+    curl -o map_page.html https://www.plznito.cz/map/49553
+    python bench_parse_locations.py --html map_page.html
+    python bench_parse_locations.py --count 20000   # synthetic page
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+
+import json5
+
+from restore_all import _parse_locations_from_html
+
+
+def parse_locations_legacy(html):
+    match = re.search(r"var\s+locations\s*=\s*(\[[\s\S]*?\])\s*;", html)
+    if not match:
+        return []
+    return json5.loads(match.group(1))
+
+
+def build_synthetic_page(count, seed=0):
+    rng = random.Random(seed)
+    locations = []
+    for ticket_id in range(40000, 40000 + count):
+        locations.append({
+            "id": ticket_id,
+            "name": f"Hlášení {ticket_id} [cyklostezka]",
+            "description": "Rozbitý povrch; \"díra\" v cyklopruhu, viz foto.\nDalší řádek.",
+            "solution": rng.choice([None, "Opraveno.", "Předáno správci komunikace."]),
+            "lat": round(49.70 + rng.random() * 0.1, 6),
+            "lng": round(13.30 + rng.random() * 0.1, 6),
+            "status": rng.choice(["V řešení", "Vyřešeno", "Odpovězeno"]),
+            "status_id": rng.choice([2, 3, 6]),
+            "category": "Komunikace",
+            "address": "Americká 1, Plzeň",
+            "photos": [f"photos/{ticket_id}.jpg"],
+            "date": "2024-05-01 12:30:00",
+        })
+    body = json.dumps(locations, ensure_ascii=False)
+    return f"<html><body><script>\nvar locations = {body};\nvar map = null;\n</script></body></html>"
+
+
+def _time_call(func, html, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(html)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--html", type=str, default=None, help="Captured map page to parse.")
+    parser.add_argument("--count", type=int, default=5000, help="Locations in the synthetic page.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.html:
+        with open(args.html, encoding="utf-8") as fr:
+            html = fr.read()
+    else:
+        html = build_synthetic_page(args.count)
+
+    legacy_s, legacy_result = _time_call(parse_locations_legacy, html, args.repeat)
+    fast_s, fast_result = _time_call(_parse_locations_from_html, html, args.repeat)
+    if legacy_result != fast_result:
+        raise SystemExit("Parsers returned different locations.")
+
+    print(f"page size:      {len(html) / 1e6:.2f} MB, {len(fast_result)} locations")
+    print(f"regex + json5:  {legacy_s * 1000:.1f} ms")
+    print(f"scanner + json: {fast_s * 1000:.1f} ms")
+    print(f"speedup:        {legacy_s / fast_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of the per-record and the NumPy batch normalization in serialize_map_data.
+
+Both paths run on the same synthetic tickets (or a DB JSON file) and must return
+identical output.
+
+Usage:
+    python bench_serialize_map_data.py --count 100000
+    python bench_serialize_map_data.py --db_json plznito_all.json --popup_mode full
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+from run_map_render import serialize_map_data
+
+DATE_SHAPES = (
+    "{:%Y-%m-%d %H:%M:%S}",
+    "{:%Y-%m-%d %H:%M:%S}.{:06d}",
+    "{:%d.%m.%Y}",
+)
+
+
+def build_synthetic_tickets(count, now, seed=0):
+    rng = random.Random(seed)
+    tickets = []
+    for ticket_id in range(40000, 40000 + count):
+        created = now - datetime.timedelta(seconds=rng.randint(0, 6 * 365 * 24 * 3600))
+        shape = rng.choices(DATE_SHAPES, weights=(85, 10, 5))[0]
+        tickets.append({
+            "id": str(ticket_id),
+            "name": f"Hlášení {ticket_id}",
+            "description": "Rozbitý povrch v cyklopruhu.",
+            "solution": rng.choice([None, "Opraveno."]),
+            "status_id": rng.choice([2, 3, 6, "3"]),
+            "latitude": f"{49.70 + rng.random() * 0.1:.6f}",
+            "longitude": f"{13.30 + rng.random() * 0.1:.6f}",
+            "date": shape.format(created, rng.randint(0, 999999)),
+            "category_id": rng.choice([1, 2, 5, None]),
+            "category": rng.choice(["Komunikace", {"name": "Zeleň"}, None]),
+            "photos": rng.choice([[f"photos/{ticket_id}.jpg"], []]),
+        })
+    return tickets
+
+
+def _time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db_json", type=str, default=None, help="Ticket list to normalize.")
+    parser.add_argument("--count", type=int, default=100000, help="Synthetic tickets.")
+    parser.add_argument("--popup_mode", type=str, default="compact", choices=["compact", "full"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    now = datetime.datetime.now()
+    if args.db_json:
+        with open(args.db_json, encoding="utf-8") as fr:
+            tickets = json.load(fr)
+    else:
+        tickets = build_synthetic_tickets(args.count, now)
+
+    loop_s, loop_result = _time_call(
+        lambda: serialize_map_data(tickets, popup_mode=args.popup_mode, now=now), args.repeat
+    )
+    batch_s, batch_result = _time_call(
+        lambda: serialize_map_data(tickets, popup_mode=args.popup_mode, now=now, batch=True), args.repeat
+    )
+    if loop_result != batch_result:
+        raise SystemExit("Batch normalization returned different output.")
+
+    print(f"records:  {len(tickets)}, rendered {loop_result['stats']['valid_rendered']}")
+    print(f"loop:     {loop_s * 1000:.1f} ms")
+    print(f"batch:    {batch_s * 1000:.1f} ms")
+    print(f"speedup:  {loop_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the crawl snapshot formats of snapshot_codec.py.
+
+Writes one snapshot in every format (plus the legacy indented JSON in bz2 that
+_save_raw_snapshot used to write), reads it back and reports write time, read time
+and size. Every format must load the same payload.
+
+Usage:
+    python bench_snapshot_codec.py --snapshot notebooks/2024-05-01-06:00:00.json.bz2
+    python bench_snapshot_codec.py --count 20000   # synthetic snapshot
+"""
+
+import argparse
+import bz2
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from bench_serialize_map_data import build_synthetic_tickets
+from snapshot_codec import SNAPSHOT_FORMATS, load_snapshot, snapshot_filename, write_snapshot, zstandard
+
+LEGACY_FORMAT = "legacy json.bz2 (indent=4)"
+
+
+def write_snapshot_legacy(path, data):
+    with bz2.open(path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+def _time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", type=str, default=None, help="Snapshot to re-encode (any format).")
+    parser.add_argument("--count", type=int, default=20000, help="Synthetic tickets without --snapshot.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.snapshot:
+        payload = load_snapshot(args.snapshot)
+        if payload is None:
+            raise SystemExit(f"{args.snapshot} is not a snapshot file.")
+    else:
+        payload = {"items": build_synthetic_tickets(args.count, datetime.datetime.now())}
+
+    formats = [LEGACY_FORMAT] + [fmt for fmt in SNAPSHOT_FORMATS if zstandard is not None or "zst" not in fmt]
+    print(f"tickets: {len(payload['items'])}")
+    print(f"{'format':<28}{'write ms':>10}{'read ms':>10}{'size KB':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in formats:
+            if fmt == LEGACY_FORMAT:
+                path = os.path.join(tmp_dir, "legacy.json.bz2")
+                write_s, _ = _time_call(lambda: write_snapshot_legacy(path, payload), args.repeat)
+            else:
+                path = os.path.join(tmp_dir, snapshot_filename("snapshot", fmt))
+                write_s, _ = _time_call(lambda: write_snapshot(path, payload), args.repeat)
+            read_s, loaded = _time_call(lambda: load_snapshot(path), args.repeat)
+            if loaded != payload:
+                raise SystemExit(f"{fmt} did not round-trip the snapshot.")
+            print(f"{fmt:<28}{write_s * 1000:>10.1f}{read_s * 1000:>10.1f}{os.path.getsize(path) / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
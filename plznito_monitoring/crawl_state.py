@@ -0,0 +1,89 @@
+"""Per-ticket crawl state used to skip or conditionally fetch unchanged tickets."""
+
+import hashlib
+import json
+import time
+from collections import Counter
+
+FINAL_STATUS_IDS = frozenset({3})  # 3 = Vyřešeno
+FINAL_REFRESH_DAYS_DEFAULT = 7
+
+
+def content_hash(item):
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _status_id(item):
+    status_id = item.get("status_id")
+    if isinstance(status_id, str) and status_id.strip().isdigit():
+        return int(status_id.strip())
+    if isinstance(status_id, int) and not isinstance(status_id, bool):
+        return status_id
+    return None
+
+
+class CrawlState:
+    """
+    Crawl bookkeeping keyed by ticket id.
+
+    Each entry holds the last fetch time, a content hash, the status id and the
+    ETag/Last-Modified validators of the last response. Tickets in a final status
+    refreshed within ``final_refresh_days`` are skipped without a request.
+    """
+
+    def __init__(self, entries=None, final_refresh_days=FINAL_REFRESH_DAYS_DEFAULT):
+        self.entries = entries or {}
+        self.final_refresh_days = final_refresh_days
+        self.stats = Counter()
+
+    @classmethod
+    def from_json(cls, data, final_refresh_days=FINAL_REFRESH_DAYS_DEFAULT):
+        entries = data.get("tickets") if isinstance(data, dict) else None
+        if not isinstance(entries, dict):
+            entries = {}
+        return cls(entries=entries, final_refresh_days=final_refresh_days)
+
+    def to_json(self):
+        return {"version": 1, "tickets": self.entries}
+
+    def is_fresh_final(self, ticket_id, now=None):
+        entry = self.entries.get(str(ticket_id))
+        if not entry or entry.get("status_id") not in FINAL_STATUS_IDS:
+            return False
+        now = time.time() if now is None else now
+        return now - entry.get("fetched_ts", 0) < self.final_refresh_days * 86400
+
+    def validators(self, ticket_id):
+        entry = self.entries.get(str(ticket_id)) or {}
+        return {
+            "etag": entry.get("etag"),
+            "last_modified": entry.get("last_modified"),
+        }
+
+    def touch(self, ticket_id, validators=None, now=None):
+        """Refresh the fetch time of an entry after a 304 response."""
+        entry = self.entries.get(str(ticket_id))
+        if entry is None:
+            return
+        entry["fetched_ts"] = int(time.time() if now is None else now)
+        for key, value in (validators or {}).items():
+            if value:
+                entry[key] = value
+
+    def record(self, ticket_id, item, validators=None, now=None):
+        """Store a freshly fetched ticket; return True when its content changed."""
+        key = str(ticket_id)
+        digest = content_hash(item)
+        previous = self.entries.get(key)
+        changed = previous is None or previous.get("hash") != digest
+        validators = validators or {}
+        self.entries[key] = {
+            "fetched_ts": int(time.time() if now is None else now),
+            "hash": digest,
+            "status_id": _status_id(item),
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+        }
+        self.stats["changed" if changed else "unchanged"] += 1
+        return changed
@@ -1,5 +1,16 @@
 """Shared filtering helpers for cycling-related ticket records."""
 
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# classify_cyklo_item results
+MATCH = "match"
+NO_MATCH = "no_match"
+MISSING_TEXT = "missing_text"
+NOT_DICT = "not_dict"
+
 
 def to_lower_text(value):
     if value is None:
@@ -17,18 +28,46 @@ def is_cyklo_record(report_text, name_text):
     )
 
 
-def filter_cyklo_items(items):
-    data_cyklo = []
+def classify_cyklo_item(item):
+    """Return MATCH, NO_MATCH, MISSING_TEXT (no report and no name) or NOT_DICT."""
+    if not isinstance(item, dict):
+        return NOT_DICT
+
+    report_text = to_lower_text(item.get("report"))
+    name_text = to_lower_text(item.get("name"))
+    if not report_text and not name_text:
+        return MISSING_TEXT
+
+    if is_cyklo_record(report_text, name_text) and "recykl" not in report_text:
+        return MATCH
+    return NO_MATCH
+
+
+def iter_cyklo_items(items):
     for item in items:
-        if not isinstance(item, dict):
-            continue
+        if classify_cyklo_item(item) is MATCH:
+            yield item
 
-        report_text = to_lower_text(item.get("report"))
-        name_text = to_lower_text(item.get("name"))
-        if not report_text and not name_text:
-            continue
 
-        if is_cyklo_record(report_text, name_text) and "recykl" not in report_text:
+def filter_cyklo_items_with_stats(items):
+    """
+    Return the cycling-related items and a Counter of classify_cyklo_item results.
+
+    One classify_cyklo_item pass: each text is lowercased once, and the missing
+    text counts come from the same pass.
+    """
+    data_cyklo = []
+    counts = Counter({MATCH: 0, NO_MATCH: 0, MISSING_TEXT: 0, NOT_DICT: 0})
+    for item in items:
+        decision = classify_cyklo_item(item)
+        counts[decision] += 1
+        if decision is MATCH:
             data_cyklo.append(item)
+    if counts[MISSING_TEXT] or counts[NOT_DICT]:
+        logger.debug("Skipped %d items without report/name text and %d non-dict items.",
+                     counts[MISSING_TEXT], counts[NOT_DICT])
+    return data_cyklo, counts
+
 
-    return data_cyklo
+def filter_cyklo_items(items):
+    return filter_cyklo_items_with_stats(items)[0]
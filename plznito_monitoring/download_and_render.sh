@@ -7,6 +7,7 @@ LOGLEVEL=INFO
 # Download the data
 python run_db_update.py --db_json plznito_all.json --write-cyklo-json plznito_cyklo.json
 
-# Render the data
-python run_map_render.py --popup_mode full --file_in plznito_cyklo.json --file_out templates/plznito_map.html
-python run_map_render.py --popup_mode full --cluster_style --file_in plznito_all.json --file_out templates/plznito_map_all.html
+# Render both maps from one load of all tickets (the bike map filters them in memory)
+python run_map_render.py --popup_mode full --payload_format columnar --data_dir map_data --file_in plznito_all.json \
+    --target templates/plznito_map.html:cyklo \
+    --target templates/plznito_map_all.html:cluster,markers_api
@@ -0,0 +1,102 @@
+"""Per-ticket cache of serialized map markers, reused by incremental renders."""
+
+import json
+import logging
+import os
+import tempfile
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Bump when _normalize_item/_serialize_marker change the marker contents.
+MARKER_CACHE_VERSION = 1
+# Skip reason of records dropped by the cyklo filter; they never reach the map stats.
+FILTERED = "filtered"
+
+
+class MarkerCache:
+    """
+    Serialized markers of the previous render keyed by ticket id and content hash.
+
+    Entries are ``[date_us, marker, skip_reason, skip_id]``: the exact creation time
+    (microseconds since the epoch) for recomputing time dependent fields, the marker
+    without its ``layer``, or the reason and id of a skipped record. Only entries
+    seen during the current render are saved, so removed tickets drop out.
+    """
+
+    def __init__(self, path, popup_mode, filter_cyklo=False):
+        self.path = path
+        self.popup_mode = popup_mode
+        self.filter_cyklo = filter_cyklo
+        self.stats = Counter()
+        self._entries = {}
+        self._seen = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path, popup_mode, filter_cyklo=False):
+        cache = cls(path, popup_mode, filter_cyklo=filter_cyklo)
+        if not os.path.exists(path):
+            return cache
+        try:
+            with open(path, encoding="utf-8") as fr:
+                data = json.load(fr)
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable marker cache %s: %s", path, exc)
+            return cache
+        if isinstance(data, dict) and data.get("header") == cache._header():
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                cache._entries = entries
+        else:
+            logger.info("Marker cache %s was built with other settings, rebuilding it.", path)
+        return cache
+
+    def _header(self):
+        return {"version": MARKER_CACHE_VERSION, "popup_mode": self.popup_mode, "filter_cyklo": self.filter_cyklo}
+
+    def get(self, ticket_id, digest):
+        """Return the cached entry for an unchanged ticket, or None."""
+        if ticket_id is None:
+            self.stats["uncached"] += 1
+            return None
+        key = str(ticket_id)
+        cached = self._entries.get(key)
+        if cached is None or cached[0] != digest:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        entry = cached[1:]
+        self._seen[key] = cached
+        return entry
+
+    def put(self, ticket_id, digest, entry):
+        if ticket_id is not None:
+            self._seen[str(ticket_id)] = [digest, *entry]
+            self._dirty = True
+
+    def save(self):
+        """Write the entries seen by this render; skipped when they equal the loaded cache."""
+        if not self._dirty and len(self._seen) == len(self._entries):
+            logger.info("Marker cache %s unchanged: hits=%d, uncached=%d.",
+                        self.path, self.stats["hits"], self.stats["uncached"])
+            return
+        target_dir = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp_marker_cache_", suffix=".json", dir=target_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fw:
+                # dumps uses the C encoder, dump would encode chunk by chunk in Python.
+                fw.write(json.dumps({"header": self._header(), "entries": self._seen}, ensure_ascii=False,
+                                    separators=(",", ":")))
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(
+            "Marker cache %s: hits=%d, misses=%d, uncached=%d, saved=%d.",
+            self.path,
+            self.stats["hits"],
+            self.stats["misses"],
+            self.stats["uncached"],
+            len(self._seen),
+        )
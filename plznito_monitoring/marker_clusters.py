@@ -0,0 +1,138 @@
+"""
+marker_clusters.py — server-side cluster pyramid for rendered map markers.
+
+Markers are bucketed into a Web Mercator grid whose cells are ``radius_px`` screen
+pixels wide at ``max_zoom``; each coarser zoom merges 2x2 cells of the finer one.
+Every cluster keeps its count broken down by (year, recency, status, category)
+group, so the page can apply its time/status/category filters to the pyramid
+without the individual markers.
+"""
+
+import math
+
+CLUSTER_MIN_ZOOM_DEFAULT = 8
+CLUSTER_MAX_ZOOM_DEFAULT = 14
+CLUSTER_RADIUS_PX_DEFAULT = 64
+_TILE_PX = 256
+_MAX_MERCATOR_LAT = 85.05112878
+
+# Recency buckets relative to the generated time, matching the page time filters.
+RECENCY_OLDER = 0
+RECENCY_LAST_30_DAYS = 1
+RECENCY_LAST_7_DAYS = 2
+
+
+def _mercator(lat, lon):
+    """Project to normalized Web Mercator ``(x, y)`` in [0, 1]."""
+    lat = max(-_MAX_MERCATOR_LAT, min(_MAX_MERCATOR_LAT, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+
+
+class ClusterPyramid:
+    """Incrementally built per-zoom marker clusters (see module docstring)."""
+
+    def __init__(self, generated_ts, min_zoom=CLUSTER_MIN_ZOOM_DEFAULT, max_zoom=CLUSTER_MAX_ZOOM_DEFAULT,
+                 radius_px=CLUSTER_RADIUS_PX_DEFAULT):
+        if not 0 <= min_zoom <= max_zoom:
+            raise ValueError("Cluster zoom range must satisfy 0 <= min_zoom <= max_zoom.")
+        self.generated_ts = generated_ts
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._cells_per_axis = max(1, (_TILE_PX << max_zoom) // radius_px)
+        self._group_codes = {}
+        self.groups = []
+        # leaf cell -> [lat_sum, lon_sum, count, {group code: count}]
+        self._leaves = {}
+        self.count = 0
+
+    def _recency(self, date_ts):
+        if date_ts >= self.generated_ts - 7 * 24 * 60 * 60:
+            return RECENCY_LAST_7_DAYS
+        if date_ts >= self.generated_ts - 30 * 24 * 60 * 60:
+            return RECENCY_LAST_30_DAYS
+        return RECENCY_OLDER
+
+    def _group_code(self, marker_data):
+        group = (
+            marker_data["year"],
+            self._recency(marker_data["date_ts"]),
+            str(marker_data["status_id"]),
+            marker_data["category_key"],
+        )
+        code = self._group_codes.get(group)
+        if code is None:
+            code = len(self.groups)
+            self._group_codes[group] = code
+            self.groups.append(group)
+        return code
+
+    def add(self, marker_data):
+        lat = marker_data["lat"]
+        lon = marker_data["lon"]
+        x, y = _mercator(lat, lon)
+        last_cell = self._cells_per_axis - 1
+        key = (min(int(x * self._cells_per_axis), last_cell), min(int(y * self._cells_per_axis), last_cell))
+        leaf = self._leaves.get(key)
+        if leaf is None:
+            leaf = self._leaves[key] = [0.0, 0.0, 0, {}]
+        leaf[0] += lat
+        leaf[1] += lon
+        leaf[2] += 1
+        breakdown = leaf[3]
+        code = self._group_code(marker_data)
+        breakdown[code] = breakdown.get(code, 0) + 1
+        self.count += 1
+
+    def iter_add(self, markers):
+        """Add markers while passing them through, for streaming renders."""
+        for marker_data in markers:
+            self.add(marker_data)
+            yield marker_data
+
+    def levels(self):
+        """Return ``{zoom: [[lat, lon, count, [group, count, ...]], ...]}`` from max_zoom down."""
+        levels = {}
+        cells = self._leaves
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            levels[zoom] = [
+                [
+                    round(lat_sum / count, 5),
+                    round(lon_sum / count, 5),
+                    count,
+                    [value for item in sorted(breakdown.items()) for value in item],
+                ]
+                for lat_sum, lon_sum, count, breakdown in cells.values()
+            ]
+            if zoom > self.min_zoom:
+                cells = self._merge_parent_cells(cells)
+        return levels
+
+    @staticmethod
+    def _merge_parent_cells(cells):
+        parents = {}
+        for (col, row), (lat_sum, lon_sum, count, breakdown) in cells.items():
+            parent_key = (col >> 1, row >> 1)
+            parent = parents.get(parent_key)
+            if parent is None:
+                parents[parent_key] = [lat_sum, lon_sum, count, dict(breakdown)]
+                continue
+            parent[0] += lat_sum
+            parent[1] += lon_sum
+            parent[2] += count
+            parent_breakdown = parent[3]
+            for code, group_count in breakdown.items():
+                parent_breakdown[code] = parent_breakdown.get(code, 0) + group_count
+        return parents
+
+    def to_data(self):
+        return {
+            "min_zoom": self.min_zoom,
+            "max_zoom": self.max_zoom,
+            "expand_zoom": self.max_zoom + 1,
+            "total": self.count,
+            "groups": [list(group) for group in self.groups],
+            "levels": {str(zoom): clusters for zoom, clusters in self.levels().items()},
+        }
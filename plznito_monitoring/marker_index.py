@@ -0,0 +1,205 @@
+"""
+marker_index.py — uniform lat/lon grid index over rendered map markers.
+
+Built from the markers of serialize_map_data (or a markers asset written by
+run_map_render.py --data_dir), it answers viewport queries so the page can fetch
+only the tickets in view instead of every ticket.
+
+Usage:
+    python marker_index.py --asset map_data/plznito_map_all_markers.<hash>.json \
+        --bbox 13.30,49.70,13.45,49.78 --zoom 15 --time_filter last_30_days
+"""
+
+import argparse
+import datetime
+import json
+import math
+from collections import defaultdict
+from urllib.parse import quote
+
+GRID_CELL_DEG_DEFAULT = 0.01  # ~1.1 km north-south, ~0.7 km east-west around Plzeň
+DETAIL_ZOOM_DEFAULT = 15
+MAX_MARKERS_DEFAULT = 2000
+# Aggregated cells are about this many screen pixels wide (256 px tiles).
+AGGREGATE_CELL_PX = 64
+
+
+def decode_markers(payload):
+    """Return marker dicts for an ``objects`` list or a ``columnar`` payload."""
+    if isinstance(payload, list):
+        return payload
+
+    full_popup = "description" in payload
+    markers = []
+    for index, ticket_id in enumerate(payload["id"]):
+        ticket_id = str(ticket_id)
+        status = payload["statuses"][payload["status"][index]]
+        category = payload["categories"][payload["category"][index]]
+        date_ts = payload["date_ts"][index]
+        marker = {
+            "id": ticket_id,
+            "status_id": status["id"],
+            "status_label": status["label"],
+            "category_key": category["key"],
+            "category_label": category["label"],
+            "name": payload["name"][index],
+            "date_text": payload["date_text"][index],
+            "date_ts": date_ts,
+            "year": datetime.datetime.fromtimestamp(date_ts, datetime.timezone.utc).year,
+            "lat": payload["lat"][index],
+            "lon": payload["lon"][index],
+            "ticket_url": f"https://www.plznito.cz/map/{quote(ticket_id, safe='')}",
+        }
+        if full_popup:
+            marker["description"] = payload["description"][index]
+            marker["solution"] = payload["solution"][index]
+            marker["photo_url"] = payload["photo_url"][index]
+        markers.append(marker)
+    return markers
+
+
+def time_filter_bounds(time_filter, generated_ts):
+    """
+    Translate a page time filter into ``(since_ts, year)``.
+
+    ``last_7_days``/``last_30_days`` are relative to ``generated_ts`` like in the
+    page script, ``year:YYYY`` selects one year and ``all_time`` (or None) nothing.
+    """
+    if time_filter in (None, "", "all_time"):
+        return None, None
+    if time_filter == "last_7_days":
+        return generated_ts - 7 * 24 * 60 * 60, None
+    if time_filter == "last_30_days":
+        return generated_ts - 30 * 24 * 60 * 60, None
+    if time_filter.startswith("year:") and time_filter[5:].isdigit():
+        return None, int(time_filter[5:])
+    raise ValueError(f"Unknown time filter {time_filter!r}.")
+
+
+def aggregate_cell_deg(zoom):
+    return 360.0 / (2 ** zoom) * AGGREGATE_CELL_PX / 256
+
+
+class MarkerGridIndex:
+    """
+    Markers bucketed into ``cell_deg`` sized lat/lon cells.
+
+    Cells keep their markers newest first, so truncated results prefer recent
+    tickets. A bbox query only visits the cells overlapping the box.
+    """
+
+    def __init__(self, markers, cell_deg=GRID_CELL_DEG_DEFAULT):
+        self.cell_deg = cell_deg
+        self.count = len(markers)
+        self.cells = defaultdict(list)
+        for marker in sorted(markers, key=lambda marker: marker["date_ts"], reverse=True):
+            self.cells[self._cell(marker["lat"], marker["lon"])].append(marker)
+        # (south, west, north, east) of all markers, bbox queries are clamped to it.
+        self.extent = None
+        if markers:
+            lats = [marker["lat"] for marker in markers]
+            lons = [marker["lon"] for marker in markers]
+            self.extent = (min(lats), min(lons), max(lats), max(lons))
+
+    @classmethod
+    def from_payload(cls, payload, cell_deg=GRID_CELL_DEG_DEFAULT):
+        return cls(decode_markers(payload), cell_deg=cell_deg)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def iter_bbox(self, south, west, north, east):
+        """Yield markers inside the bbox (inclusive)."""
+        if self.extent is None:
+            return
+        # Clamped to the markers' extent, so a huge bbox never maps to a huge cell range.
+        min_south, min_west, max_north, max_east = self.extent
+        min_row, min_col = self._cell(max(min_south, south), max(min_west, west))
+        max_row, max_col = self._cell(min(max_north, north), min(max_east, east))
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            # Zoomed far out: walking the occupied cells is cheaper than the range.
+            cell_keys = [
+                key for key in self.cells
+                if min_row <= key[0] <= max_row and min_col <= key[1] <= max_col
+            ]
+        else:
+            cell_keys = [
+                (row, col)
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self.cells
+            ]
+
+        for key in cell_keys:
+            for marker in self.cells[key]:
+                if south <= marker["lat"] <= north and west <= marker["lon"] <= east:
+                    yield marker
+
+    def query(self, bbox, zoom=None, since_ts=None, year=None, statuses=None, categories=None,
+              max_markers=MAX_MARKERS_DEFAULT, detail_zoom=DETAIL_ZOOM_DEFAULT):
+        """
+        Return markers in ``bbox`` = ``(south, west, north, east)`` matching the filters.
+
+        ``statuses``/``categories`` are sets of filter keys (None keeps all). When more
+        than ``max_markers`` match below ``detail_zoom``, the result holds ``cells``
+        with marker counts on a zoom dependent grid instead of ``markers``.
+        """
+        matches = []
+        for marker in self.iter_bbox(*bbox):
+            if since_ts is not None and marker["date_ts"] < since_ts:
+                continue
+            if year is not None and marker["year"] != year:
+                continue
+            if statuses is not None and str(marker["status_id"]) not in statuses:
+                continue
+            if categories is not None and marker["category_key"] not in categories:
+                continue
+            matches.append(marker)
+
+        result = {"total": len(matches), "indexed": self.count}
+        if len(matches) <= max_markers or zoom is None or zoom >= detail_zoom:
+            matches.sort(key=lambda marker: marker["date_ts"], reverse=True)
+            result["markers"] = matches[:max_markers]
+            result["truncated"] = len(matches) > max_markers
+            return result
+
+        cell_deg = aggregate_cell_deg(zoom)
+        sums = {}
+        for marker in matches:
+            key = (math.floor(marker["lat"] / cell_deg), math.floor(marker["lon"] / cell_deg))
+            cell = sums.get(key)
+            if cell is None:
+                sums[key] = [marker["lat"], marker["lon"], 1]
+            else:
+                cell[0] += marker["lat"]
+                cell[1] += marker["lon"]
+                cell[2] += 1
+        result["cells"] = [
+            {"lat": lat_sum / count, "lon": lon_sum / count, "count": count}
+            for lat_sum, lon_sum, count in sums.values()
+        ]
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--asset", type=str, required=True, help="Markers JSON asset (objects or columnar).")
+    parser.add_argument("--bbox", type=str, required=True, help="west,south,east,north")
+    parser.add_argument("--zoom", type=int, default=None)
+    parser.add_argument("--time_filter", type=str, default=None)
+    parser.add_argument("--generated_ts", type=int, default=None,
+                        help="Reference time for relative time filters (default: now).")
+    args = parser.parse_args()
+
+    with open(args.asset, encoding="utf-8") as f:
+        index = MarkerGridIndex.from_payload(json.load(f))
+    west, south, east, north = (float(value) for value in args.bbox.split(","))
+    generated_ts = args.generated_ts
+    if generated_ts is None:
+        generated_ts = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    since_ts, year = time_filter_bounds(args.time_filter, generated_ts)
+    result = index.query((south, west, north, east), zoom=args.zoom, since_ts=since_ts, year=year)
+    summary = {key: value for key, value in result.items() if key not in ("markers", "cells")}
+    summary["markers"] = len(result.get("markers", []))
+    summary["cells"] = len(result.get("cells", []))
+    print(json.dumps(summary))
@@ -1,14 +1,20 @@
-import requests
 import os
+import sys
 import json
 import tqdm
 import simplejson.errors
 import logging
 import argparse
+import hashlib
 import re
+import threading
 import json5
+from collections import Counter
+from pathlib import Path
 from requests.exceptions import RequestException
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import http_client
 from cyklo_filter import filter_cyklo_items
 
 logger = logging.getLogger(__name__)
@@ -18,7 +24,7 @@ def download_one_id(id, source="auto"):
     url = f"https://www.plznito.cz/api/1.0/tickets/detail/{id}"
     if source in ("auto", "api"):
         try:
-            r = requests.get(url, timeout=20)
+            r = http_client.get(url, timeout=20)
             r.raise_for_status()
             out = r.json()
             if out:
@@ -30,17 +36,25 @@ def download_one_id(id, source="auto"):
     return scrape_one_id_from_map(id)
 
 
-def scrape_one_id_from_map(id):
+def _fetch_map_page_response(id, headers=None):
     url = f"https://www.plznito.cz/map/{id}"
     try:
-        r = requests.get(url, timeout=20)
+        r = http_client.get(url, timeout=20, headers=headers)
         r.raise_for_status()
     except RequestException as e:
         logger.warning("Map fetch failed for id %s: %s", id, e)
-        return {}
+        return None
+    return r
+
+
+def _fetch_map_page(id):
+    r = _fetch_map_page_response(id)
+    return None if r is None else r.text
+
 
+def _item_from_map_html(id, html):
     try:
-        locations = _parse_locations_from_html(r.text)
+        locations = _parse_locations_from_html(html)
     except Exception as e:
         logger.warning("Failed to parse locations for id %s: %s", id, e)
         return {}
@@ -53,12 +67,161 @@ def scrape_one_id_from_map(id):
     return {}
 
 
+def scrape_one_id_from_map(id):
+    html = _fetch_map_page(id)
+    if html is None:
+        return {}
+    return _item_from_map_html(id, html)
+
+
+def scrape_one_id_conditional(id, etag=None, last_modified=None):
+    """
+    scrape_one_id_from_map with If-None-Match / If-Modified-Since validators.
+
+    Returns ``(output, validators)``. ``output`` is None when the server answered
+    304 Not Modified; ``validators`` holds the ETag/Last-Modified of the response.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    r = _fetch_map_page_response(id, headers=headers or None)
+    if r is None:
+        return {}, {}
+    validators = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+    }
+    if r.status_code == 304:
+        return None, validators
+    return _item_from_map_html(id, r.text), validators
+
+
+class MapPageIndex:
+    """
+    Batch variant of scrape_one_id_from_map for crawling many ids.
+
+    Every distinct map page body is parsed once and its ``locations`` are indexed by
+    id, so most ids are answered without any request. Ids missing from the index fall
+    back to fetching their own map page. Safe to share between crawl threads.
+    """
+
+    def __init__(self, rate_limiter=None):
+        self._rate_limiter = rate_limiter
+        self._locations = {}
+        self._page_hashes = set()
+        self._lock = threading.Lock()
+        self._first_page_lock = threading.Lock()
+        self.stats = Counter()
+
+    def _lookup(self, id):
+        with self._lock:
+            return self._locations.get(str(id))
+
+    def _load_page(self, id):
+        if self._rate_limiter is not None:
+            self._rate_limiter.wait()
+        html = _fetch_map_page(id)
+        with self._lock:
+            self.stats["page_fetches"] += 1
+        if html is None:
+            return
+
+        page_hash = hashlib.sha1(html.encode("utf-8")).hexdigest()
+        with self._lock:
+            if page_hash in self._page_hashes:
+                self.stats["duplicate_pages"] += 1
+                return
+            self._page_hashes.add(page_hash)
+
+        try:
+            locations = _parse_locations_from_html(html)
+        except Exception as e:
+            logger.warning("Failed to parse locations for id %s: %s", id, e)
+            return
+
+        with self._lock:
+            self.stats["parsed_pages"] += 1
+            for location in locations:
+                location_id = location.get("id")
+                if location_id is not None:
+                    self._locations.setdefault(str(location_id), location)
+
+    def scrape(self, id):
+        page_loaded = False
+        if not self._page_hashes:
+            # Let the first page populate the index before concurrent workers fall back.
+            with self._first_page_lock:
+                if not self._page_hashes and self._lookup(id) is None:
+                    self._load_page(id)
+                    page_loaded = True
+
+        location = self._lookup(id)
+        if location is not None:
+            with self._lock:
+                self.stats["index_hits"] += 1
+            return {"item": _location_to_item(location)}
+
+        # The first-page load above already fetched this id's page, do not fetch it again.
+        if not page_loaded:
+            self._load_page(id)
+            location = self._lookup(id)
+        if location is None:
+            logger.warning("No matching item for id %s in map page", id)
+            return {}
+        return {"item": _location_to_item(location)}
+
+
+_LOCATIONS_START_RE = re.compile(r"var\s+locations\s*=\s*(?=\[)")
+# Strings (kept whole so brackets inside them are ignored), comments and brackets.
+_JS_ARRAY_TOKEN_RE = re.compile(
+    r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    r"|'[^'\\]*(?:\\.[^'\\]*)*'"
+    r"|//[^\n]*|/\*[\s\S]*?\*/"
+    r"|[\[\]]"
+)
+MAX_LOCATIONS_JS_CHARS = 64 * 1024 * 1024
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _find_js_array_end(text, start, max_chars=MAX_LOCATIONS_JS_CHARS):
+    """Return the index just past the array literal opened at ``text[start]``, or None."""
+    depth = 0
+    endpos = min(len(text), start + max_chars)
+    for token in _JS_ARRAY_TOKEN_RE.finditer(text, start, endpos):
+        value = token.group()
+        if value == "[":
+            depth += 1
+        elif value == "]":
+            depth -= 1
+            if depth == 0:
+                return token.end()
+    return None
+
+
 def _parse_locations_from_html(html):
-    match = re.search(r"var\s+locations\s*=\s*(\[[\s\S]*?\])\s*;", html)
-    if not match:
+    start_match = _LOCATIONS_START_RE.search(html)
+    if not start_match:
         return []
-    locations_js = match.group(1)
-    return json5.loads(locations_js)
+    start = start_match.end()
+
+    # Fast path: strict JSON decoded in place by the C decoder, no copy of the literal.
+    try:
+        locations, _ = _JSON_DECODER.raw_decode(html, start)
+        return locations
+    except ValueError:
+        pass
+
+    end = _find_js_array_end(html, start)
+    if end is None:
+        # Unbalanced or oversized literal, let the lenient regex + json5 path decide.
+        match = re.search(r"var\s+locations\s*=\s*(\[[\s\S]*?\])\s*;", html)
+        if not match:
+            return []
+        return json5.loads(match.group(1))
+    return json5.loads(html[start:end])
 
 
 def _location_to_item(location):
@@ -93,9 +256,12 @@ if __name__ == "__main__":
     parser.add_argument("--data_dir", type=str, default="data")
     parser.add_argument("--source", type=str, default="auto", choices=["auto", "api", "web"],
                         help="Fetch source: auto (API fallback to web), api, or web.")
+    parser.add_argument("--batch-map", action="store_true",
+                        help="With --source web, parse each distinct map page once and answer ids from it.")
     args = parser.parse_args()
 
     os.makedirs(args.data_dir, exist_ok=True)
+    map_index = MapPageIndex() if args.batch_map else None
 
     for i in tqdm.tqdm(range(42260, 49554)):
         # delete a local file if it exists but is empty or invalid
@@ -108,7 +274,9 @@ if __name__ == "__main__":
                 os.remove(os.path.join(args.data_dir, f"{i}.json"))
         # download data
         if not os.path.exists(os.path.join(args.data_dir, f"{i}.json")):
-            if args.source == "web":
+            if args.source == "web" and map_index is not None:
+                json_data = map_index.scrape(i)
+            elif args.source == "web":
                 json_data = scrape_one_id_from_map(i)
             else:
                 json_data = download_one_id(i, source=args.source)
@@ -1,13 +1,28 @@
 import argparse
-import bz2
 import json
 import logging
 import os
+import sys
 import tempfile
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, nullcontext
 from datetime import datetime
-
-from cyklo_filter import filter_cyklo_items, to_lower_text
-from restore_all import download_one_id
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import http_client
+from crawl_state import FINAL_REFRESH_DAYS_DEFAULT, CrawlState
+from cyklo_filter import MATCH, MISSING_TEXT, NOT_DICT, filter_cyklo_items, filter_cyklo_items_with_stats
+from restore_all import MapPageIndex, download_one_id, scrape_one_id_conditional
+from snapshot_codec import SNAPSHOT_FORMAT_DEFAULT, SNAPSHOT_FORMATS, is_snapshot_file, load_snapshot, \
+    snapshot_filename, write_snapshot
+from ticket_collection import TicketCollection
+from ticket_store import TicketStore
 SCRAPER_IMPORT_ERROR = None
 
 logger = logging.getLogger(__name__)
@@ -16,6 +31,10 @@ ID_WINDOW_BACK_DEFAULT = 100
 ID_LOOKAHEAD_DEFAULT = 200
 SEED_DATA_DIR_DEFAULT = "data"
 MAX_CONSECUTIVE_SCRAPE_FAILURES = 10
+CRAWL_WORKERS_DEFAULT = 1
+CRAWL_RATE_LIMIT_DEFAULT = 0.0
+RESTORE_PROCESSES_DEFAULT = 1
+RESTORE_PROGRESS_INTERVAL_S = 10.0
 
 
 def _load_json_file(file_path):
@@ -84,13 +103,12 @@ def _collect_valid_records(records, source_name):
     return valid_records
 
 
-def _save_raw_snapshot(data, out_dirname):
+def _save_raw_snapshot(data, out_dirname, snapshot_format=SNAPSHOT_FORMAT_DEFAULT):
     target_dir = out_dirname or "."
     os.makedirs(target_dir, exist_ok=True)
-    snapshot_filename = datetime.today().strftime("%Y-%m-%d-%H:%M:%S") + ".json.bz2"
-    snapshot_path = os.path.join(target_dir, snapshot_filename)
-    with bz2.open(snapshot_path, "wt", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    snapshot_name = snapshot_filename(datetime.today().strftime("%Y-%m-%d-%H:%M:%S"), snapshot_format)
+    snapshot_path = os.path.join(target_dir, snapshot_name)
+    write_snapshot(snapshot_path, data)
     logger.info("Saved raw update snapshot to %s.", snapshot_path)
 
 
@@ -168,18 +186,114 @@ def _extract_item(scraper_output):
     return item
 
 
+class _RateLimiter:
+    """
+    Thread-safe limiter spacing request starts at least ``1 / rate`` seconds apart.
+
+    The crawler talks to www.plznito.cz only, so one limiter shared by all workers
+    is the per-host limit. ``rate <= 0`` disables limiting.
+    """
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self._interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+_TicketFetch = namedtuple("_TicketFetch", ["data", "unchanged", "validators"])
+
+
+def _scrape_ticket(ticket_id, rate_limiter=None, map_index=None, crawl_state=None):
+    if crawl_state is not None and crawl_state.is_fresh_final(ticket_id):
+        return _TicketFetch(None, "fresh_final", None)
+    if map_index is not None:
+        # The index applies the rate limit to the page fetches it actually makes.
+        return _TicketFetch(map_index.scrape(ticket_id), None, None)
+    if rate_limiter is not None:
+        rate_limiter.wait()
+    if crawl_state is not None:
+        scraped_data, validators = scrape_one_id_conditional(ticket_id, **crawl_state.validators(ticket_id))
+        if scraped_data is None:
+            return _TicketFetch(None, "not_modified", validators)
+        return _TicketFetch(scraped_data, None, validators)
+    return _TicketFetch(download_one_id(ticket_id, source="web"), None, None)
+
+
+def _iter_scraped_tickets(ticket_ids, fetch, workers=CRAWL_WORKERS_DEFAULT):
+    """
+    Yield ``(ticket_id, fetch(ticket_id), exc)`` tuples in ``ticket_ids`` order.
+
+    With ``workers > 1`` the tickets are fetched by a thread pool keeping at most
+    ``2 * workers`` requests in flight. Results are still yielded in id order, so the
+    caller sees exactly the sequence of the sequential crawl; closing the generator
+    cancels the requests that have not started yet.
+    """
+    if workers <= 1:
+        for ticket_id in ticket_ids:
+            try:
+                result = (ticket_id, fetch(ticket_id), None)
+            except Exception as exc:  # pragma: no cover - network/runtime dependent
+                result = (ticket_id, None, exc)
+            yield result
+        return
+
+    ticket_iter = iter(ticket_ids)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plznito-crawl")
+    try:
+        for ticket_id in islice(ticket_iter, 2 * workers):
+            pending.append((ticket_id, executor.submit(fetch, ticket_id)))
+
+        while pending:
+            ticket_id, future = pending.popleft()
+            for next_id in islice(ticket_iter, 1):
+                pending.append((next_id, executor.submit(fetch, next_id)))
+            try:
+                result = (ticket_id, future.result(), None)
+            except Exception as exc:  # pragma: no cover - network/runtime dependent
+                result = (ticket_id, None, exc)
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def get_plznito_current_data(
     existing_records,
     anchor_id=None,
     id_window_back=ID_WINDOW_BACK_DEFAULT,
     id_lookahead=ID_LOOKAHEAD_DEFAULT,
     seed_data_dir=SEED_DATA_DIR_DEFAULT,
+    workers=CRAWL_WORKERS_DEFAULT,
+    rate_limit=CRAWL_RATE_LIMIT_DEFAULT,
+    batch_map=False,
+    crawl_state=None,
 ):
     """
     Build current update payload by scraping web map ticket detail pages.
+
+    ``workers`` > 1 fetches tickets concurrently; ``rate_limit`` caps request starts
+    per second (0 = unlimited). The payload is identical to the sequential crawl.
+    ``batch_map`` answers ids from an index of the parsed map pages (see MapPageIndex).
+
+    With a ``crawl_state`` (see crawl_state.CrawlState) recently refreshed tickets in a
+    final status are skipped and the rest are fetched conditionally. Skipped and
+    not-modified tickets are left out of the payload, so merge_data keeps their DB
+    records as they are.
     """
     if download_one_id is None:  # pragma: no cover - environment dependent
         raise RuntimeError(f"Web scraper unavailable: {SCRAPER_IMPORT_ERROR}")
+    if workers < 1:
+        raise ValueError("workers must be >= 1.")
 
     resolved_anchor, anchor_source = _resolve_anchor_id(
         existing_records,
@@ -196,43 +310,48 @@ def get_plznito_current_data(
     empty_items = 0
     consecutive_failures = 0
     scanned_count = 0
-    for ticket_id in range(start_id, end_id + 1):
-        scanned_count += 1
-        try:
-            scraped_data = download_one_id(ticket_id, source="web")
-            logger.info("Downloaded ticket %d via web scraping.", ticket_id)
-        except Exception as exc:  # pragma: no cover - network/runtime dependent
-            logger.warning("Web scrape failed for id %s: %s", ticket_id, exc)
-            empty_items += 1
-            consecutive_failures += 1
-            if consecutive_failures >= MAX_CONSECUTIVE_SCRAPE_FAILURES:
-                logger.warning(
-                    "Stopping crawl after %d consecutive failures at id %d.",
-                    consecutive_failures,
-                    ticket_id,
-                )
-                break
-            continue
-
-        item = _extract_item(scraped_data)
-        if item is None:
-            empty_items += 1
-            consecutive_failures += 1
-            if consecutive_failures >= MAX_CONSECUTIVE_SCRAPE_FAILURES:
-                logger.warning(
-                    "Stopping crawl after %d consecutive failures at id %d.",
-                    consecutive_failures,
-                    ticket_id,
-                )
-                break
-            continue
-        items.append(item)
-        consecutive_failures = 0
+    saved_fetches = Counter()
+    rate_limiter = _RateLimiter(rate_limit)
+    map_index = MapPageIndex(rate_limiter=rate_limiter) if batch_map else None
+    fetch = partial(_scrape_ticket, rate_limiter=rate_limiter, map_index=map_index, crawl_state=crawl_state)
+    scraped_tickets = _iter_scraped_tickets(range(start_id, end_id + 1), fetch, workers=workers)
+    with closing(scraped_tickets):
+        for ticket_id, fetched, exc in scraped_tickets:
+            scanned_count += 1
+            if exc is not None:
+                logger.warning("Web scrape failed for id %s: %s", ticket_id, exc)
+                item = None
+            elif fetched.unchanged is not None:
+                logger.debug("Ticket %d unchanged (%s), not downloaded.", ticket_id, fetched.unchanged)
+                saved_fetches[fetched.unchanged] += 1
+                if fetched.unchanged == "not_modified":
+                    crawl_state.touch(ticket_id, fetched.validators)
+                consecutive_failures = 0
+                continue
+            else:
+                logger.info("Downloaded ticket %d via web scraping.", ticket_id)
+                item = _extract_item(fetched.data)
+
+            if item is None:
+                empty_items += 1
+                consecutive_failures += 1
+                if consecutive_failures >= MAX_CONSECUTIVE_SCRAPE_FAILURES:
+                    logger.warning(
+                        "Stopping crawl after %d consecutive failures at id %d.",
+                        consecutive_failures,
+                        ticket_id,
+                    )
+                    break
+                continue
+            items.append(item)
+            consecutive_failures = 0
+            if crawl_state is not None:
+                crawl_state.record(ticket_id, item, fetched.validators)
 
     payload = _validate_payload({"items": items})
     logger.info(
         "Downloaded current plznito payload via web scraping (anchor=%s, source=%s, range=%d-%d, "
-        "scanned=%d, items=%d, empty=%d).",
+        "scanned=%d, items=%d, empty=%d, workers=%d).",
         resolved_anchor,
         anchor_source,
         start_id,
@@ -240,7 +359,26 @@ def get_plznito_current_data(
         scanned_count,
         len(items),
         empty_items,
+        workers,
     )
+    if map_index is not None:
+        logger.info(
+            "Map page index: index_hits=%d, page_fetches=%d, parsed_pages=%d, duplicate_pages=%d.",
+            map_index.stats["index_hits"],
+            map_index.stats["page_fetches"],
+            map_index.stats["parsed_pages"],
+            map_index.stats["duplicate_pages"],
+        )
+    if crawl_state is not None:
+        logger.info(
+            "Crawl state: saved_fetches=%d (fresh_final=%d, not_modified=%d), changed=%d, unchanged=%d.",
+            sum(saved_fetches.values()),
+            saved_fetches["fresh_final"],
+            saved_fetches["not_modified"],
+            crawl_state.stats["changed"],
+            crawl_state.stats["unchanged"],
+        )
+    http_client.log_stats(logger)
     return payload
 
 
@@ -255,13 +393,20 @@ def _load_db_records(json_db_file_path):
     return data_db
 
 
-def _load_snapshot_payload(full_fname):
-    if full_fname.endswith(".json"):
-        return _load_json_file(full_fname)
-    if full_fname.endswith(".bz2"):
-        with bz2.open(full_fname, "rt", encoding="utf-8") as fr:
-            return json.load(fr)
-    return None
+def _load_crawl_state(crawl_state_path, final_refresh_days, existing_records):
+    if not existing_records:
+        # Skipped tickets are kept from the DB, so a fresh DB must not trust old state.
+        logger.info("DB is empty, starting with empty crawl state.")
+        return CrawlState(final_refresh_days=final_refresh_days)
+    if not os.path.exists(crawl_state_path):
+        logger.info("Crawl state %s does not exist. Starting with empty state.", crawl_state_path)
+        return CrawlState(final_refresh_days=final_refresh_days)
+    try:
+        data = _load_json_file(crawl_state_path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable crawl state %s: %s", crawl_state_path, exc)
+        return CrawlState(final_refresh_days=final_refresh_days)
+    return CrawlState.from_json(data, final_refresh_days=final_refresh_days)
 
 
 def _restore_seed_data(start_json_name):
@@ -282,74 +427,185 @@ def filter_data(data):
     """
     payload = _validate_payload(data)
     items = payload["items"]
-    data_cyklo = filter_cyklo_items(items)
-    skipped_missing_text = 0
-    for item in items:
-        if not isinstance(item, dict):
-            skipped_missing_text += 1
-            logger.debug("Skipping non-dict item in filter_data: %r", item)
-            continue
-
-        report_text = to_lower_text(item.get("report"))
-        name_text = to_lower_text(item.get("name"))
-        if not report_text and not name_text:
-            skipped_missing_text += 1
-            logger.debug("Skipping item without report/name text. id=%s", item.get("id"))
+    data_cyklo, counts = filter_cyklo_items_with_stats(items)
 
     logger.info(
         "Filtered cycling items: %d/%d (skipped_missing_text=%d).",
-        len(data_cyklo),
+        counts[MATCH],
         len(items),
-        skipped_missing_text,
+        counts[MISSING_TEXT] + counts[NOT_DICT],
     )
     return data_cyklo
 
 
+def _merge_into(collection, data_new, source_name="incoming update"):
+    """Merge ``data_new`` into the TicketCollection, logging and returning the MergeResult."""
+    result = collection.merge(_collect_valid_records(data_new, source_name))
+    logger.info(
+        "Merged %d input records from %s: inserted=%d, updated=%d, unchanged=%d => %d output.",
+        len(data_new),
+        source_name,
+        len(result.inserted),
+        len(result.updated),
+        len(result.unchanged),
+        len(collection),
+    )
+    return result
+
+
+def _id_index_path(json_db_file_path):
+    return json_db_file_path + ".ids"
+
+
+def _load_collection(json_db_file_path, records):
+    """
+    Return the TicketCollection of the JSON DB ``records``.
+
+    The ids written next to the DB by _write_collection are reused while the DB
+    file is the one they were written with, so the records are not re-read;
+    otherwise (first run, DB edited by hand) every record id is normalized again.
+    """
+    try:
+        index = _load_json_file(_id_index_path(json_db_file_path))
+        stat = os.stat(json_db_file_path)
+    except (OSError, ValueError):
+        index = None
+    if (
+        isinstance(index, dict)
+        and index.get("size") == stat.st_size
+        and index.get("mtime_ns") == stat.st_mtime_ns
+        and isinstance(index.get("ids"), list)
+    ):
+        try:
+            return TicketCollection.from_index(records, index["ids"])
+        except ValueError as exc:
+            logger.warning("Ignoring id index of %s: %s", json_db_file_path, exc)
+    return TicketCollection(_collect_valid_records(records, json_db_file_path))
+
+
+def _write_collection(json_db_file_path, collection):
+    """Write the collection to the JSON DB and its ids next to it, returning the records."""
+    records = collection.records()
+    _atomic_write_json(json_db_file_path, records, indent=4)
+    stat = os.stat(json_db_file_path)
+    _atomic_write_json(
+        _id_index_path(json_db_file_path),
+        {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "ids": collection.ids()},
+        indent=None,
+    )
+    return records
+
+
 def merge_data(data_old, data_new):
     """
     Merge two json, use the newer data
     """
-    valid_old = _collect_valid_records(data_old, "existing DB")
-    valid_new = _collect_valid_records(data_new, "incoming update")
+    collection = TicketCollection(_collect_valid_records(data_old, "existing DB"))
+    _merge_into(collection, data_new)
+    return collection.records()
 
-    ids_new = {record_id for record_id, _ in valid_new}
-    data_old_filtered = [record for record_id, record in valid_old if record_id not in ids_new]
-    data_out = data_old_filtered + [record for _, record in valid_new]
 
-    logger.info(
-        "Merging old=%d valid/%d input + new=%d valid/%d input => %d output.",
-        len(valid_old),
-        len(data_old),
-        len(valid_new),
-        len(data_new),
-        len(data_out),
-    )
-    return data_out
+def _decode_and_filter_snapshot(full_fname):
+    """
+    Decode one snapshot and keep its cycling items (a db_restore pool task).
+
+    Returns ``(cycling items, input item count, missing text count, error)``; the
+    error message is set instead of raising so the restore can skip the snapshot.
+    """
+    try:
+        items = _validate_payload(load_snapshot(full_fname))["items"]
+        data_cyklo, counts = filter_cyklo_items_with_stats(items)
+    except (OSError, EOFError, ValueError) as exc:
+        return None, 0, 0, str(exc)
+    return data_cyklo, len(items), counts[MISSING_TEXT] + counts[NOT_DICT], None
 
 
-def db_restore(start_json_name=None, data_dirname="."):
-    # how to process all data
-    # aka DB restore
-    data = _restore_seed_data(start_json_name)
+def _iter_decoded_snapshots(snapshot_paths, processes=RESTORE_PROCESSES_DEFAULT):
+    """
+    Yield ``(path, _decode_and_filter_snapshot(path))`` in ``snapshot_paths`` order.
 
-    for fname in sorted(os.listdir(data_dirname)):
-        full_fname = os.path.join(data_dirname, fname)
-        if not (full_fname.endswith(".json") or full_fname.endswith(".bz2")):
-            continue
+    With ``processes > 1`` the snapshots are decoded by a process pool keeping at
+    most ``2 * processes`` snapshots in flight, so only their (small) cycling
+    subsets come back to this process.
+    """
+    if processes <= 1:
+        for path in snapshot_paths:
+            yield path, _decode_and_filter_snapshot(path)
+        return
+
+    path_iter = iter(snapshot_paths)
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=processes)
+    try:
+        for path in islice(path_iter, 2 * processes):
+            pending.append((path, executor.submit(_decode_and_filter_snapshot, path)))
+
+        while pending:
+            path, future = pending.popleft()
+            for next_path in islice(path_iter, 1):
+                pending.append((next_path, executor.submit(_decode_and_filter_snapshot, next_path)))
+            yield path, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
-        try:
-            data_new = _load_snapshot_payload(full_fname)
-            if data_new is None:
-                continue
-            data_cyklo = filter_data(data_new)
-        except (OSError, ValueError, json.JSONDecodeError) as exc:
-            logger.warning("Skipping snapshot %s due to invalid payload: %s", full_fname, exc)
-            continue
 
-        data = merge_data(data, data_cyklo)
+def db_restore(start_json_name=None, data_dirname=".", processes=RESTORE_PROCESSES_DEFAULT):
+    """
+    Rebuild plznito_cyklo.json from the seed DB and every snapshot in ``data_dirname``.
+
+    Snapshots are decoded and filtered by ``processes`` workers and applied in
+    filename order to one TicketCollection (the last snapshot with a ticket wins),
+    so the merge is linear in the number of snapshots and the DB is written once.
+    """
+    collection = TicketCollection(_collect_valid_records(_restore_seed_data(start_json_name), "existing DB"))
+
+    snapshot_paths = [
+        os.path.join(data_dirname, fname)
+        for fname in sorted(os.listdir(data_dirname))
+        if is_snapshot_file(fname)
+    ]
+    started = time.monotonic()
+    last_progress = started
+    stats = Counter()
+    for index, (full_fname, (data_cyklo, input_count, missing_text, error)) in enumerate(
+            _iter_decoded_snapshots(snapshot_paths, processes=processes), start=1):
+        stats["bytes"] += os.path.getsize(full_fname)
+        if error is not None:
+            stats["skipped"] += 1
+            logger.warning("Skipping snapshot %s due to invalid payload: %s", full_fname, error)
+        else:
+            stats["items"] += input_count
+            logger.debug(
+                "Snapshot %s: %d/%d cycling items (skipped_missing_text=%d).",
+                full_fname,
+                len(data_cyklo),
+                input_count,
+                missing_text,
+            )
+            collection.merge(_collect_valid_records(data_cyklo, full_fname))
+
+        now = time.monotonic()
+        if now - last_progress >= RESTORE_PROGRESS_INTERVAL_S or index == len(snapshot_paths):
+            last_progress = now
+            elapsed = max(now - started, 1e-9)
+            logger.info(
+                "Restore progress: %d/%d snapshots, %d items read, %d tickets, %.1f snapshots/s, %.1f MB/s.",
+                index,
+                len(snapshot_paths),
+                stats["items"],
+                len(collection),
+                index / elapsed,
+                stats["bytes"] / elapsed / 1e6,
+            )
 
-    _atomic_write_json("plznito_cyklo.json", data, indent=4)
-    logger.info("Restore completed: wrote %d items to plznito_cyklo.json.", len(data))
+    data = _write_collection("plznito_cyklo.json", collection)
+    logger.info(
+        "Restore completed: wrote %d items to plznito_cyklo.json (%d snapshots, %d skipped, %.1f s).",
+        len(data),
+        len(snapshot_paths),
+        stats["skipped"],
+        time.monotonic() - started,
+    )
 
 
 def db_update(
@@ -357,50 +613,149 @@ def db_update(
     out_dirname="",
     filter_cyklo=True,
     save_update_data=False,
+    snapshot_format=SNAPSHOT_FORMAT_DEFAULT,
     write_cyklo_json_path=None,
     anchor_id=None,
     id_window_back=ID_WINDOW_BACK_DEFAULT,
     id_lookahead=ID_LOOKAHEAD_DEFAULT,
     seed_data_dir=SEED_DATA_DIR_DEFAULT,
+    workers=CRAWL_WORKERS_DEFAULT,
+    rate_limit=CRAWL_RATE_LIMIT_DEFAULT,
+    batch_map=False,
+    crawl_state_path=None,
+    final_refresh_days=FINAL_REFRESH_DAYS_DEFAULT,
+    store_path=None,
+    export_json=True,
 ):
     """
     update with daily data
+
+    With ``store_path`` the SQLite ticket store is the DB and ``json_db_file_path``
+    is only its JSON export (written when ``export_json`` is set).
+
+    Returns the ticket_collection.MergeResult of the JSON DB (ids inserted, updated
+    and unchanged by this update), or None with a store, which logs its own counts.
+    The JSON files are only rewritten when the update inserted or updated tickets.
     """
+    with TicketStore(store_path) if store_path else nullcontext() as store:
+        return _db_update(
+            json_db_file_path,
+            store,
+            out_dirname=out_dirname,
+            filter_cyklo=filter_cyklo,
+            save_update_data=save_update_data,
+            snapshot_format=snapshot_format,
+            write_cyklo_json_path=write_cyklo_json_path,
+            export_json=export_json,
+            crawl_state_path=crawl_state_path,
+            final_refresh_days=final_refresh_days,
+            crawl_options={
+                "anchor_id": anchor_id,
+                "id_window_back": id_window_back,
+                "id_lookahead": id_lookahead,
+                "seed_data_dir": seed_data_dir,
+                "workers": workers,
+                "rate_limit": rate_limit,
+                "batch_map": batch_map,
+            },
+        )
+
+
+def _seed_store_from_json(store, json_db_file_path):
+    if store.count() or not os.path.exists(json_db_file_path):
+        return
+    logger.info("Ticket store %s is empty, importing %s.", store.path, json_db_file_path)
+    records = _load_db_records(json_db_file_path)
+    store.upsert(_collect_valid_records(records, json_db_file_path))
+
+
+def _write_store_update(store, data_current, json_db_file_path, filter_cyklo, write_cyklo_json_path, export_json):
+    incoming = filter_data(data_current) if filter_cyklo else data_current["items"]
+    changes = store.upsert(_collect_valid_records(incoming, "incoming update"))
+
+    targets = []
+    if export_json:
+        targets.append(json_db_file_path)
+    if write_cyklo_json_path:
+        targets.append(write_cyklo_json_path)
+    if not (changes["inserted"] or changes["updated"]) and all(os.path.exists(t) for t in targets):
+        logger.info("No ticket changes, JSON exports are up to date.")
+        return
+
+    data_updated = store.load_records()
+    if export_json:
+        _atomic_write_json(json_db_file_path, data_updated, indent=4)
+        logger.info("Exported %d tickets from %s to %s.", len(data_updated), store.path, json_db_file_path)
+    if write_cyklo_json_path:
+        data_cyklo_updated = data_updated if filter_cyklo else filter_cyklo_items(data_updated)
+        _atomic_write_json(write_cyklo_json_path, data_cyklo_updated, indent=4)
+        logger.info(
+            "Wrote derived cycling DB to %s (%d items).",
+            write_cyklo_json_path,
+            len(data_cyklo_updated),
+        )
+
+
+def _write_collection_update(collection, merge_result, json_db_file_path, filter_cyklo, write_cyklo_json_path):
+    targets = [json_db_file_path] + ([write_cyklo_json_path] if write_cyklo_json_path else [])
+    if not (merge_result.inserted or merge_result.updated) and all(os.path.exists(t) for t in targets):
+        logger.info("No ticket changes, %s is up to date.", json_db_file_path)
+        return
+
+    data_updated = _write_collection(json_db_file_path, collection)
+    if write_cyklo_json_path:
+        data_cyklo_updated = data_updated if filter_cyklo else filter_cyklo_items(data_updated)
+        _atomic_write_json(write_cyklo_json_path, data_cyklo_updated, indent=4)
+        logger.info(
+            "Wrote derived cycling DB to %s (%d items).",
+            write_cyklo_json_path,
+            len(data_cyklo_updated),
+        )
+
+
+def _db_update(
+    json_db_file_path,
+    store,
+    out_dirname,
+    filter_cyklo,
+    save_update_data,
+    snapshot_format,
+    write_cyklo_json_path,
+    export_json,
+    crawl_state_path,
+    final_refresh_days,
+    crawl_options,
+):
     # add data to our db
-    data_db = _load_db_records(json_db_file_path)
+    if store is not None:
+        _seed_store_from_json(store, json_db_file_path)
+        data_db = store.load_records()
+    else:
+        data_db = _load_db_records(json_db_file_path)
+    crawl_state = _load_crawl_state(crawl_state_path, final_refresh_days, data_db) if crawl_state_path else None
 
     # load new data
-    data_current = get_plznito_current_data(
-        data_db,
-        anchor_id=anchor_id,
-        id_window_back=id_window_back,
-        id_lookahead=id_lookahead,
-        seed_data_dir=seed_data_dir,
-    )
+    data_current = get_plznito_current_data(data_db, crawl_state=crawl_state, **crawl_options)
 
     if save_update_data:
-        _save_raw_snapshot(data_current, out_dirname)
-
-    if filter_cyklo:
-        data_cyklo_current = filter_data(data_current)
-        data_cyklo_updated = merge_data(data_db, data_cyklo_current)
-        _atomic_write_json(json_db_file_path, data_cyklo_updated, indent=4)
-        if write_cyklo_json_path:
-            _atomic_write_json(write_cyklo_json_path, data_cyklo_updated, indent=4)
-            logger.info("Wrote derived cycling DB to %s.", write_cyklo_json_path)
+        _save_raw_snapshot(data_current, out_dirname, snapshot_format=snapshot_format)
+
+    if store is not None:
+        _write_store_update(store, data_current, json_db_file_path, filter_cyklo, write_cyklo_json_path,
+                            export_json)
+        merge_result = None
     else:
-        data_updated = merge_data(data_db, data_current["items"])
-        _atomic_write_json(json_db_file_path, data_updated, indent=4)
-        if write_cyklo_json_path:
-            data_cyklo_updated = filter_cyklo_items(data_updated)
-            _atomic_write_json(write_cyklo_json_path, data_cyklo_updated, indent=4)
-            logger.info(
-                "Wrote derived cycling DB to %s (%d items).",
-                write_cyklo_json_path,
-                len(data_cyklo_updated),
-            )
+        collection = _load_collection(json_db_file_path, data_db)
+        incoming = filter_data(data_current) if filter_cyklo else data_current["items"]
+        merge_result = _merge_into(collection, incoming)
+        _write_collection_update(collection, merge_result, json_db_file_path, filter_cyklo, write_cyklo_json_path)
+
+    if crawl_state is not None:
+        _atomic_write_json(crawl_state_path, crawl_state.to_json(), indent=None)
+        logger.info("Saved crawl state for %d tickets to %s.", len(crawl_state.entries), crawl_state_path)
 
     logger.info("Merging finished. Output file: %s", json_db_file_path)
+    return merge_result
 
 
 if __name__ == "__main__":
@@ -411,11 +766,29 @@ if __name__ == "__main__":
     parser.add_argument("--no-filter-cyklo", dest="filter_cyklo", action="store_false")
     parser.add_argument("--restore", action="store_true")
     parser.add_argument("--save_update_data", action="store_true")
+    parser.add_argument("--snapshot-format", type=str, default=SNAPSHOT_FORMAT_DEFAULT, choices=SNAPSHOT_FORMATS,
+                        help="Format of the --save_update_data snapshot; restore reads every format.")
     parser.add_argument("--write-cyklo-json", type=str, default=None)
     parser.add_argument("--anchor-id", type=int, default=None)
     parser.add_argument("--id-window-back", type=int, default=ID_WINDOW_BACK_DEFAULT)
     parser.add_argument("--id-lookahead", type=int, default=ID_LOOKAHEAD_DEFAULT)
     parser.add_argument("--seed-data-dir", type=str, default=SEED_DATA_DIR_DEFAULT)
+    parser.add_argument("--workers", type=int, default=CRAWL_WORKERS_DEFAULT,
+                        help="Number of concurrent crawl workers (1 = sequential).")
+    parser.add_argument("--rate-limit", type=float, default=CRAWL_RATE_LIMIT_DEFAULT,
+                        help="Max requests per second to plznito.cz (0 = unlimited).")
+    parser.add_argument("--batch-map", action="store_true",
+                        help="Parse each distinct map page once and answer crawl ids from it.")
+    parser.add_argument("--crawl-state", type=str, default=None,
+                        help="Per-ticket crawl state file enabling incremental, conditional crawling.")
+    parser.add_argument("--final-refresh-days", type=int, default=FINAL_REFRESH_DAYS_DEFAULT,
+                        help="Skip resolved tickets refreshed within this many days (with --crawl-state).")
+    parser.add_argument("--store", type=str, default=None,
+                        help="SQLite ticket store used as the DB; --db_json becomes its JSON export.")
+    parser.add_argument("--no-export-json", dest="export_json", action="store_false",
+                        help="With --store, do not export the store to --db_json.")
+    parser.add_argument("--restore-processes", type=int, default=RESTORE_PROCESSES_DEFAULT,
+                        help="With --restore, decode and filter snapshots in this many processes.")
     parser.set_defaults(filter_cyklo=None)
     args = parser.parse_args()
 
@@ -427,7 +800,7 @@ if __name__ == "__main__":
 
     if args.restore:
         restore_seed = args.db_json if os.path.exists(args.db_json) else None
-        db_restore(start_json_name=restore_seed, data_dirname="data")
+        db_restore(start_json_name=restore_seed, data_dirname="data", processes=args.restore_processes)
         raise SystemExit(0)
 
     if args.filter_cyklo is None:
@@ -440,9 +813,17 @@ if __name__ == "__main__":
         out_dirname="notebooks",
         filter_cyklo=filter_cyklo,
         save_update_data=args.save_update_data,
+        snapshot_format=args.snapshot_format,
         write_cyklo_json_path=args.write_cyklo_json,
         anchor_id=args.anchor_id,
         id_window_back=args.id_window_back,
         id_lookahead=args.id_lookahead,
         seed_data_dir=args.seed_data_dir,
+        workers=args.workers,
+        rate_limit=args.rate_limit,
+        batch_map=args.batch_map,
+        crawl_state_path=args.crawl_state,
+        final_refresh_days=args.final_refresh_days,
+        store_path=args.store,
+        export_json=args.export_json,
     )
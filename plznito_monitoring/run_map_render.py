@@ -1,13 +1,37 @@
 import json
+import gzip
+import hashlib
+import io
 import os
 import datetime
 import logging
 import argparse
+import shutil
 import tempfile
 import re
-from collections import Counter
+import sys
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from pathlib import Path
 from urllib.parse import quote
 
+try:
+    import brotli
+except ImportError:  # optional, only used for precompressed .br marker assets
+    brotli = None
+
+try:
+    import numpy as np
+except ImportError:  # optional, only used by serialize_map_data_batch
+    np = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.dates import DateParser
+from cyklo_filter import filter_cyklo_items, iter_cyklo_items
+from marker_cache import FILTERED, MarkerCache
+from marker_clusters import ClusterPyramid
+from ticket_store import TicketStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,6 +40,7 @@ DATE_FORMATS = (
     "%Y-%m-%d %H:%M:%S",
     "%d.%m.%Y",
 )
+_DATE_PARSER = DateParser(DATE_FORMATS)
 DEFAULT_CENTER = [49.7443392, 13.3766164]
 DEFAULT_ZOOM = 13
 DEFAULT_TIME_FILTER = "last_30_days"
@@ -37,12 +62,7 @@ def _parse_date_value(value):
     text_value = str(value).strip()
     if not text_value:
         return None
-    for fmt in DATE_FORMATS:
-        try:
-            return datetime.datetime.strptime(text_value, fmt)
-        except ValueError:
-            continue
-    return None
+    return _DATE_PARSER.parse(text_value)
 
 
 def _parse_item_datetime(item):
@@ -179,16 +199,24 @@ def _normalize_item(item):
     if latitude is None or longitude is None:
         return None, "invalid_coordinates"
 
+    normalized = _normalized_record(item, status_id, date_text, latitude, longitude)
+    normalized["date_obj"] = date_time_obj
+    normalized["date_ts"] = _to_unix_timestamp(date_time_obj)
+    normalized["year"] = date_time_obj.year
+    return normalized, None
+
+
+def _normalized_record(item, status_id, date_text, latitude, longitude):
+    """Build the normalized record from already validated fields (dates are added by the caller)."""
     category_id = _parse_optional_int(item.get("category_id"))
     category_key, category_label = _resolve_category_filter(category_id, item.get("category"))
 
-    normalized = {
-        "id": item_id,
+    return {
+        "id": item["id"],
         "status_id": status_id,
         "name": item.get("name", ""),
         "description": item.get("description", ""),
         "solution": item.get("solution"),
-        "date_obj": date_time_obj,
         "date_text": date_text,
         "latitude": latitude,
         "longitude": longitude,
@@ -197,7 +225,6 @@ def _normalize_item(item):
         "category_key": category_key,
         "category_label": category_label,
     }
-    return normalized, None
 
 
 def _item_id_for_skip(item):
@@ -219,8 +246,8 @@ def _serialize_marker(item, popup_mode):
         "category_label": item["category_label"],
         "name": "" if item["name"] is None else str(item["name"]),
         "date_text": item["date_text"],
-        "date_ts": _to_unix_timestamp(item["date_obj"]),
-        "year": item["date_obj"].year,
+        "date_ts": item["date_ts"],
+        "year": item["year"],
         "lat": item["latitude"],
         "lon": item["longitude"],
         "ticket_url": f"https://www.plznito.cz/map/{quote(ticket_id, safe='')}",
@@ -251,26 +278,49 @@ def _category_option_sort_key(option):
     return 2, option["label"].lower()
 
 
-def serialize_map_data(data_current, popup_mode="compact", now=None):
-    if popup_mode not in {"compact", "full"}:
-        raise ValueError("popup_mode must be 'compact' or 'full'.")
+def _new_map_summary(popup_mode, now):
+    return {
+        "stats": Counter(),
+        "rendered": 0,
+        "skipped": [],
+        "years": set(),
+        "status_options_map": {},
+        "category_options_map": {},
+        "popup_mode": popup_mode,
+        "now": now,
+    }
 
-    if now is None:
-        now = datetime.datetime.now()
 
+def iter_normalized_records(data_current):
+    """Yield ``(item, normalized_item, error_reason)`` for each record, see _normalize_item."""
+    for item in data_current:
+        normalized_item, error_reason = _normalize_item(item)
+        yield item, normalized_item, error_reason
+
+
+def iter_map_markers(data_current, summary):
+    """
+    Yield serialized markers for ``data_current`` one record at a time.
+
+    Stats, skipped records, years and filter options are accumulated into
+    ``summary`` (see _new_map_summary); finish it with _finalize_map_summary once
+    the generator is exhausted.
+    """
+    return iter_normalized_map_markers(iter_normalized_records(data_current), summary)
+
+
+def iter_normalized_map_markers(normalized_records, summary):
+    """Like iter_map_markers for the tuples of iter_normalized_records."""
+    popup_mode = summary["popup_mode"]
+    now = summary["now"]
     recent_cutoff_7 = now - datetime.timedelta(days=7)
     recent_cutoff_30 = now - datetime.timedelta(days=30)
-    stats = Counter()
-    markers = []
-    skipped = []
-    years = set()
-    status_options_map = {}
-    category_options_map = {}
+    stats = summary["stats"]
+    skipped = summary["skipped"]
 
-    for item in data_current:
+    for item, normalized_item, error_reason in normalized_records:
         stats["input_records"] += 1
 
-        normalized_item, error_reason = _normalize_item(item)
         if error_reason is not None:
             stats[f"skipped_{error_reason}"] += 1
             skipped.append({"id": _item_id_for_skip(item), "reason": error_reason})
@@ -278,78 +328,534 @@ def serialize_map_data(data_current, popup_mode="compact", now=None):
             continue
 
         marker_data = _serialize_marker(normalized_item, popup_mode=popup_mode)
+        _add_marker_to_summary(
+            summary,
+            marker_data,
+            normalized_item["date_obj"] > recent_cutoff_7,
+            normalized_item["date_obj"] > recent_cutoff_30,
+        )
+        yield marker_data
+
+
+def _add_marker_to_summary(summary, marker_data, in_last_7_days, in_last_30_days):
+    """Assign the marker layer and account it in the summary stats and filter options."""
+    stats = summary["stats"]
+    if in_last_7_days:
+        stats["added_last_7_days"] += 1
+
+    if in_last_30_days:
+        marker_data["layer"] = "recent"
+        stats["added_last_30_days"] += 1
+    else:
+        year = marker_data["year"]
+        marker_data["layer"] = str(year)
+        summary["years"].add(year)
+        stats["added_year_layer"] += 1
+
+    status_options_map = summary["status_options_map"]
+    category_options_map = summary["category_options_map"]
+
+    status_key = str(marker_data["status_id"])
+    if status_key not in status_options_map:
+        status_options_map[status_key] = {
+            "key": status_key,
+            "label": marker_data["status_label"],
+        }
+
+    category_key = marker_data["category_key"]
+    if category_key not in category_options_map:
+        category_options_map[category_key] = {
+            "key": category_key,
+            "label": marker_data["category_label"],
+        }
+
+    summary["rendered"] += 1
+
+
+def _marker_cache_entry(item, popup_mode, filter_cyklo=False):
+    if filter_cyklo and not any(iter_cyklo_items((item,))):
+        return [None, None, FILTERED, None]
+    normalized_item, error_reason = _normalize_item(item)
+    if error_reason is not None:
+        logger.debug("Skipping record due to %s: %r", error_reason, item)
+        return [None, None, error_reason, _item_id_for_skip(item)]
+    return [_datetime_to_us(normalized_item["date_obj"]), _serialize_marker(normalized_item, popup_mode), None, None]
+
+
+def iter_map_markers_cached(hashed_records, summary, marker_cache):
+    """
+    Like iter_map_markers for ``(ticket_id, digest, record, record_json)`` tuples,
+    reusing the markers of unchanged tickets from ``marker_cache`` (see
+    marker_cache.MarkerCache).
+
+    Sources may pass ``record=None`` with its JSON text, decoded only on a cache miss.
+    Cached markers only get their layer and recency stats recomputed.
+    """
+    popup_mode = summary["popup_mode"]
+    now = summary["now"]
+    cutoff_7_us = _datetime_to_us(now - datetime.timedelta(days=7))
+    cutoff_30_us = _datetime_to_us(now - datetime.timedelta(days=30))
+    stats = summary["stats"]
+    skipped = summary["skipped"]
+
+    for ticket_id, digest, record, record_json in hashed_records:
+        entry = marker_cache.get(ticket_id, digest)
+        if entry is None:
+            if record is None:
+                record = json.loads(record_json)
+            entry = _marker_cache_entry(record, popup_mode, filter_cyklo=marker_cache.filter_cyklo)
+            marker_cache.put(ticket_id, digest, entry)
+
+        date_us, marker_data, error_reason, skip_id = entry
+        if error_reason == FILTERED:
+            continue
+        stats["input_records"] += 1
+        if error_reason is not None:
+            stats[f"skipped_{error_reason}"] += 1
+            skipped.append({"id": skip_id, "reason": error_reason})
+            continue
 
-        if normalized_item["date_obj"] > recent_cutoff_7:
-            stats["added_last_7_days"] += 1
-
-        if normalized_item["date_obj"] > recent_cutoff_30:
-            marker_data["layer"] = "recent"
-            stats["added_last_30_days"] += 1
-        else:
-            year = normalized_item["date_obj"].year
-            marker_data["layer"] = str(year)
-            years.add(year)
-            stats["added_year_layer"] += 1
-
-        status_key = str(marker_data["status_id"])
-        if status_key not in status_options_map:
-            status_options_map[status_key] = {
-                "key": status_key,
-                "label": marker_data["status_label"],
-            }
-
-        category_key = marker_data["category_key"]
-        if category_key not in category_options_map:
-            category_options_map[category_key] = {
-                "key": category_key,
-                "label": marker_data["category_label"],
-            }
+        marker_data = dict(marker_data)
+        _add_marker_to_summary(summary, marker_data, date_us > cutoff_7_us, date_us > cutoff_30_us)
+        yield marker_data
 
-        markers.append(marker_data)
 
-    stats["valid_rendered"] = len(markers)
+def _finalize_map_summary(summary, markers=None):
+    stats = summary["stats"]
+    stats["valid_rendered"] = summary["rendered"]
     stats["skipped_total"] = stats["input_records"] - stats["valid_rendered"]
-    status_options = sorted(status_options_map.values(), key=_status_option_sort_key)
-    category_options = sorted(category_options_map.values(), key=_category_option_sort_key)
+    status_options = sorted(summary["status_options_map"].values(), key=_status_option_sort_key)
+    category_options = sorted(summary["category_options_map"].values(), key=_category_option_sort_key)
 
     return {
         "markers": markers,
-        "years": sorted(years),
+        "years": sorted(summary["years"]),
         "status_options": status_options,
         "category_options": category_options,
-        "skipped": skipped,
+        "skipped": summary["skipped"],
         "stats": stats,
-        "popup_mode": popup_mode,
-        "generated_ts": _to_unix_timestamp(now),
+        "popup_mode": summary["popup_mode"],
+        "generated_ts": _to_unix_timestamp(summary["now"]),
     }
 
 
-def _json_for_inline_script(data):
-    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+def serialize_map_data(data_current, popup_mode="compact", now=None, batch=False):
+    if popup_mode not in {"compact", "full"}:
+        raise ValueError("popup_mode must be 'compact' or 'full'.")
 
+    if now is None:
+        now = datetime.datetime.now()
 
-def _minify_html(html_text):
-    block_pattern = re.compile(r"(?is)<(script|style|pre|textarea)\b.*?</\1>")
-    preserved_blocks = []
+    if batch:
+        if np is not None:
+            return serialize_map_data_batch(data_current, popup_mode=popup_mode, now=now)
+        logger.warning("numpy is not installed, normalizing map records one by one.")
+
+    summary = _new_map_summary(popup_mode, now)
+    markers = list(iter_map_markers(data_current, summary))
+    return _finalize_map_summary(summary, markers)
+
+
+# Strings strptime("%Y-%m-%d %H:%M:%S[.%f]") accepts and NumPy parses the same way.
+_ISO_DATETIME_RE = re.compile(r"^(?!0000)\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d{1,6})?$")
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _datetime_to_us(value):
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _parse_date_texts_us(date_texts):
+    """Map distinct date strings to microseconds since the epoch, None when unparseable."""
+    parsed = {}
+    iso_texts = [text for text in date_texts if _ISO_DATETIME_RE.match(text)]
+    if iso_texts:
+        try:
+            values = np.array(iso_texts, dtype="datetime64[us]").astype(np.int64)
+        except ValueError:
+            pass  # e.g. a day out of range; those strings go through strptime below
+        else:
+            parsed.update(zip(iso_texts, values.tolist()))
+
+    for text in date_texts:
+        if text not in parsed:
+            date_obj = _parse_date_value(text)
+            parsed[text] = None if date_obj is None else _datetime_to_us(date_obj)
+    return parsed
+
+
+def _clean_coordinate(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if not value or value.lower() == "none":
+            return None
+    return value
+
+
+def _parse_coordinate_column(values):
+    """Convert raw coordinates to float64, NaN marking the ones _parse_coordinate rejects."""
+    cleaned = [_clean_coordinate(value) for value in values]
+    missing = np.fromiter((value is None for value in cleaned), dtype=bool, count=len(cleaned))
+    try:
+        coordinates = np.array([0.0 if value is None else value for value in cleaned], dtype=np.float64)
+        if coordinates.shape != (len(cleaned),):
+            raise ValueError("coordinates are not scalars")
+    except (TypeError, ValueError):
+        parsed = [_parse_coordinate(value) for value in cleaned]
+        missing = np.fromiter((value is None for value in parsed), dtype=bool, count=len(parsed))
+        coordinates = np.array([0.0 if value is None else value for value in parsed], dtype=np.float64)
+    return coordinates, missing
+
+
+def serialize_map_data_batch(data_current, popup_mode="compact", now=None):
+    """
+    Column-wise variant of serialize_map_data with the same output; needs NumPy.
+
+    Records are scanned once into columns, each distinct date string is parsed once
+    (ISO strings in a single NumPy call), coordinates are converted as arrays and the
+    7/30-day cutoffs and layers are array comparisons.
+    """
+    if np is None:
+        raise ImportError("serialize_map_data_batch needs numpy.")
+    if popup_mode not in {"compact", "full"}:
+        raise ValueError("popup_mode must be 'compact' or 'full'.")
+    if now is None:
+        now = datetime.datetime.now()
+
+    items = data_current if isinstance(data_current, list) else list(data_current)
+    count = len(items)
+    reasons = [None] * count
+    status_ids = [None] * count
+    date_candidates = [()] * count
+    latitudes_raw = [None] * count
+    longitudes_raw = [None] * count
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get("id") is None:
+            reasons[index] = "missing_required_fields"
+            continue
+        status_id = _parse_status_id(item.get("status_id"))
+        if status_id is None:
+            reasons[index] = "missing_required_fields"
+            continue
+        status_ids[index] = status_id
+
+        created = item.get("created")
+        raw_dates = (created.get("date"), item.get("date")) if isinstance(created, dict) else (item.get("date"),)
+        date_candidates[index] = tuple(
+            text for text in (str(raw).strip() for raw in raw_dates if raw is not None) if text
+        )
+        latitudes_raw[index] = item.get("latitude")
+        longitudes_raw[index] = item.get("longitude")
+
+    parsed_dates = _parse_date_texts_us({text for texts in date_candidates for text in texts})
+    date_us = np.zeros(count, dtype=np.int64)
+    date_texts = [None] * count
+    for index, texts in enumerate(date_candidates):
+        if reasons[index] is not None:
+            continue
+        for text in texts:
+            value = parsed_dates[text]
+            if value is not None:
+                date_us[index] = value
+                date_texts[index] = text
+                break
+        else:
+            reasons[index] = "invalid_date"
+
+    latitudes, latitude_missing = _parse_coordinate_column(latitudes_raw)
+    longitudes, longitude_missing = _parse_coordinate_column(longitudes_raw)
+    for index in np.flatnonzero(latitude_missing | longitude_missing).tolist():
+        if reasons[index] is None:
+            reasons[index] = "invalid_coordinates"
+
+    # int(datetime.timestamp()) truncates toward zero, also before 1970.
+    date_ts = np.where(date_us >= 0, date_us // 1_000_000, -(-date_us // 1_000_000))
+    date_years = date_us.astype("datetime64[us]").astype("datetime64[Y]").astype(np.int64) + 1970
+    in_last_7 = date_us > _datetime_to_us(now - datetime.timedelta(days=7))
+    in_last_30 = date_us > _datetime_to_us(now - datetime.timedelta(days=30))
+
+    # Plain Python values for the per-marker dicts (NumPy scalar indexing is slow).
+    date_ts = date_ts.tolist()
+    date_years = date_years.tolist()
+    in_last_7 = in_last_7.tolist()
+    in_last_30 = in_last_30.tolist()
+    latitudes = latitudes.tolist()
+    longitudes = longitudes.tolist()
+
+    summary = _new_map_summary(popup_mode, now)
+    stats = summary["stats"]
+    stats["input_records"] = count
+    markers = []
+    for index, item in enumerate(items):
+        error_reason = reasons[index]
+        if error_reason is not None:
+            stats[f"skipped_{error_reason}"] += 1
+            summary["skipped"].append({"id": _item_id_for_skip(item), "reason": error_reason})
+            logger.debug("Skipping record due to %s: %r", error_reason, item)
+            continue
+
+        normalized_item = _normalized_record(
+            item, status_ids[index], date_texts[index], latitudes[index], longitudes[index]
+        )
+        normalized_item["date_ts"] = date_ts[index]
+        normalized_item["year"] = date_years[index]
+        marker_data = _serialize_marker(normalized_item, popup_mode=popup_mode)
+        _add_marker_to_summary(summary, marker_data, in_last_7[index], in_last_30[index])
+        markers.append(marker_data)
 
-    def _preserve_block(match):
-        block_id = len(preserved_blocks)
-        preserved_blocks.append(match.group(0))
-        return f"__HTML_MINIFY_BLOCK_{block_id}__"
+    return _finalize_map_summary(summary, markers)
 
-    minified = block_pattern.sub(_preserve_block, html_text)
-    minified = re.sub(r"<!--(?!\s*\[if).*?-->", "", minified, flags=re.DOTALL)
-    minified = re.sub(r">\s+<", "><", minified)
-    minified = minified.strip()
 
-    for block_id, block_text in enumerate(preserved_blocks):
-        minified = minified.replace(f"__HTML_MINIFY_BLOCK_{block_id}__", block_text)
+def _json_for_inline_script(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
 
-    return minified
+
+_MINIFY_BLOCK_TAGS = ("script", "style", "pre", "textarea")
+_MINIFY_BLOCK_OPEN_RE = re.compile(r"(?i)<(%s)\b" % "|".join(_MINIFY_BLOCK_TAGS))
+_MINIFY_BLOCK_CLOSE_RES = {tag: re.compile(rf"(?i)</{tag}>") for tag in _MINIFY_BLOCK_TAGS}
+_MINIFY_TAG_GAP_RE = re.compile(r">\s+<")
+_MINIFY_CONDITIONAL_COMMENT_RE = re.compile(r"\s*\[if")
+
+
+class _HtmlMinifyWriter:
+    """
+    Text sink of write_minified_html: drops whitespace between tags and at both
+    ends of the document, holding back trailing whitespace of each run until the
+    next run shows whether it sits between ``>`` and ``<``.
+    """
+
+    def __init__(self, fw):
+        self._fw = fw
+        self._started = False
+        self._last_char = ""
+        self._pending_space = ""
+
+    def text(self, text):
+        # str.strip removes exactly the characters \s matches.
+        leading = len(text) - len(text.lstrip())
+        if leading == len(text):
+            self._pending_space += text
+            return
+        trailing = len(text.rstrip())
+        core = text[leading:trailing]
+        space = self._pending_space + text[:leading]
+        if space and self._started and not (self._last_char == ">" and core[0] == "<"):
+            self._fw.write(space)
+        self._fw.write(_MINIFY_TAG_GAP_RE.sub("><", core))
+        self._started = True
+        self._last_char = core[-1]
+        self._pending_space = text[trailing:]
+
+    def block(self, block):
+        if self._started and self._pending_space:
+            self._fw.write(self._pending_space)
+        self._fw.write(block)
+        self._started = True
+        # Whitespace next to a preserved block is kept, it is not between tags.
+        self._last_char = ""
+        self._pending_space = ""
+
+
+def _find_minify_block(html_text, pos):
+    """
+    Return ``(start, end)`` of the first ``<tag ...>...</tag>`` block at or after
+    ``pos``, or None. Same match as ``(?is)<(script|...)\b.*?</\1>``, but the end
+    is a plain search for the closing tag instead of a lazy scan.
+    """
+    while True:
+        opening = _MINIFY_BLOCK_OPEN_RE.search(html_text, pos)
+        if opening is None:
+            return None
+        closing = _MINIFY_BLOCK_CLOSE_RES[opening.group(1).lower()].search(html_text, opening.end())
+        if closing is not None:
+            return opening.start(), closing.end()
+        pos = opening.start() + 1
+
+
+def write_minified_html(fw, html_text):
+    """
+    Write ``html_text`` minified to ``fw`` in one left-to-right pass.
+
+    script/style/pre/textarea blocks are written unchanged, comments other than
+    conditional ones (``<!--[if``) are dropped, whitespace between tags and at the
+    ends of the document is removed. Blocks, like the markers script, are written
+    in one piece instead of being swapped for placeholders and back.
+    """
+    sink = _HtmlMinifyWriter(fw)
+    block = _find_minify_block(html_text, 0)
+    pos = 0
+    text_start = 0
+    comment_start = html_text.find("<!--")
+    while True:
+        if 0 <= comment_start < pos:
+            comment_start = html_text.find("<!--", pos)
+        block_start = block[0] if block else len(html_text)
+        if comment_start == -1 or comment_start >= block_start:
+            if text_start < block_start:
+                sink.text(html_text[text_start:block_start])
+            if block is None:
+                break
+            sink.block(html_text[block[0]:block[1]])
+            pos = text_start = block[1]
+            block = _find_minify_block(html_text, pos)
+            continue
+
+        if _MINIFY_CONDITIONAL_COMMENT_RE.match(html_text, comment_start + 4):
+            pos = comment_start + 4
+            continue
+        # The comment ends at the first "-->" outside preserved blocks; blocks inside it are dropped.
+        comment_end = html_text.find("-->", comment_start + 4)
+        next_block = block
+        while next_block is not None and comment_end != -1 and next_block[0] < comment_end:
+            if comment_end < next_block[1]:
+                comment_end = html_text.find("-->", next_block[1])
+            else:
+                next_block = _find_minify_block(html_text, next_block[1])
+        if comment_end == -1:
+            # Unterminated: kept as text, and so is every "<!--" after it.
+            comment_start = -1
+            continue
+        if text_start < comment_start:
+            sink.text(html_text[text_start:comment_start])
+        pos = text_start = comment_end + 3
+        block = next_block
 
 
-def _build_map_html(serialized_data, cluster=False):
-    markers_json = _json_for_inline_script(serialized_data["markers"])
+def _minify_html(html_text):
+    output = io.StringIO()
+    write_minified_html(output, html_text)
+    return output.getvalue()
+
+
+PAYLOAD_FORMATS = ("objects", "columnar")
+COLUMNAR_BASE_COLUMNS = ("id", "lat", "lon", "date_ts", "status", "category", "name", "date_text")
+COLUMNAR_FULL_POPUP_COLUMNS = ("description", "solution", "photo_url")
+
+
+def _columnar_ticket_id(ticket_id):
+    """Store an id as a JSON number only when it round-trips ("007" stays a string)."""
+    if ticket_id.isascii() and ticket_id.isdigit() and str(int(ticket_id)) == ticket_id:
+        return int(ticket_id)
+    return ticket_id
+
+
+class ColumnarMarkers:
+    """
+    Column-oriented, dictionary-encoded marker payload.
+
+    Ids, coordinates, timestamps and texts are parallel arrays; status and category
+    are small-int codes into the ``statuses``/``categories`` lookup tables. The page
+    script derives ``ticket_url`` from the id and ``year`` from ``date_ts``. With
+    ``spool=True`` the columns are buffered in temporary files instead of memory.
+    """
+
+    def __init__(self, popup_mode="compact", spool=False):
+        self.columns = COLUMNAR_BASE_COLUMNS
+        if popup_mode == "full":
+            self.columns += COLUMNAR_FULL_POPUP_COLUMNS
+        self._spool = spool
+        self._values = {
+            name: tempfile.TemporaryFile("w+", encoding="utf-8") if spool else []
+            for name in self.columns
+        }
+        self._status_codes = {}
+        self._statuses = []
+        self._category_codes = {}
+        self._categories = []
+        self.count = 0
+
+    def _status_code(self, marker_data):
+        status_id = marker_data["status_id"]
+        code = self._status_codes.get(status_id)
+        if code is None:
+            code = len(self._statuses)
+            self._status_codes[status_id] = code
+            self._statuses.append({"id": status_id, "label": marker_data["status_label"]})
+        return code
+
+    def _category_code(self, marker_data):
+        category_key = marker_data["category_key"]
+        code = self._category_codes.get(category_key)
+        if code is None:
+            code = len(self._categories)
+            self._category_codes[category_key] = code
+            self._categories.append({"key": category_key, "label": marker_data["category_label"]})
+        return code
+
+    def add(self, marker_data):
+        ticket_id = marker_data["id"]
+        row = {
+            "id": _columnar_ticket_id(ticket_id),
+            "lat": marker_data["lat"],
+            "lon": marker_data["lon"],
+            "date_ts": marker_data["date_ts"],
+            "status": self._status_code(marker_data),
+            "category": self._category_code(marker_data),
+            "name": marker_data["name"],
+            "date_text": marker_data["date_text"],
+        }
+        for name in COLUMNAR_FULL_POPUP_COLUMNS:
+            if name in self._values:
+                row[name] = marker_data[name]
+
+        for name, value in row.items():
+            column = self._values[name]
+            if self._spool:
+                if self.count:
+                    column.write(",")
+                column.write(_json_for_inline_script(value))
+            else:
+                column.append(value)
+        self.count += 1
+
+    def write(self, fw):
+        fw.write('{"statuses":')
+        fw.write(_json_for_inline_script(self._statuses))
+        fw.write(',"categories":')
+        fw.write(_json_for_inline_script(self._categories))
+        for name in self.columns:
+            fw.write(f',"{name}":')
+            column = self._values[name]
+            if self._spool:
+                fw.write("[")
+                column.seek(0)
+                shutil.copyfileobj(column, fw)
+                fw.write("]")
+            else:
+                fw.write(_json_for_inline_script(column))
+        fw.write("}")
+
+    def to_json(self):
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    def close(self):
+        if self._spool:
+            for column in self._values.values():
+                column.close()
+
+
+def _markers_json(markers, payload_format="objects", popup_mode="compact"):
+    if payload_format == "columnar":
+        columnar = ColumnarMarkers(popup_mode=popup_mode)
+        for marker_data in markers:
+            columnar.add(marker_data)
+        return columnar.to_json()
+    return _json_for_inline_script(markers)
+
+
+def _build_map_html(serialized_data, cluster=False, markers_json=None, payload_format="objects", markers_url=None,
+                    markers_api_url=None, cluster_pyramid=None):
+    if markers_json is None and (markers_url is not None or markers_api_url is not None):
+        markers_json = "null"
+    elif markers_json is None:
+        markers_json = _markers_json(
+            serialized_data["markers"],
+            payload_format=payload_format,
+            popup_mode=serialized_data["popup_mode"],
+        )
     years_json = _json_for_inline_script(serialized_data["years"])
     status_options_json = _json_for_inline_script(serialized_data["status_options"])
     category_options_json = _json_for_inline_script(serialized_data["category_options"])
@@ -357,6 +863,9 @@ def _build_map_html(serialized_data, cluster=False):
     status_colors_json = _json_for_inline_script({str(key): value for key, value in STATUS_COLOR_MAP.items()})
     status_labels_json = _json_for_inline_script({str(key): value for key, value in STATUS_LABEL_MAP.items()})
     generated_ts_json = _json_for_inline_script(serialized_data["generated_ts"])
+    markers_url_json = _json_for_inline_script(markers_url)
+    markers_api_url_json = _json_for_inline_script(markers_api_url)
+    cluster_pyramid_json = _json_for_inline_script(cluster_pyramid)
     use_cluster = "true" if cluster else "false"
 
     return f"""<!-- Generated by run_map_render.py -->
@@ -432,6 +941,12 @@ def _build_map_html(serialized_data, cluster=False):
     border-radius: 50%;
     margin-right: 6px;
   }}
+  .plznito-cell-label {{
+    background: transparent;
+    border: none;
+    box-shadow: none;
+    font-weight: 600;
+  }}
   .leaflet-popup-content {{
     font-size: 12px;
   }}
@@ -498,7 +1013,10 @@ def _build_map_html(serialized_data, cluster=False):
 <script src="https://cdnjs.cloudflare.com/ajax/libs/Leaflet.awesome-markers/2.0.2/leaflet.awesome-markers.js"></script>
 <script>
 (function () {{
-  const markers = {markers_json};
+  const inlineMarkers = {markers_json};
+  const markersUrl = {markers_url_json};
+  const markersApiUrl = {markers_api_url_json};
+  const clusterPyramid = {cluster_pyramid_json};
   const years = {years_json};
   const statusOptions = {status_options_json};
   const categoryOptions = {category_options_json};
@@ -510,6 +1028,40 @@ def _build_map_html(serialized_data, cluster=False):
   const statusColors = {status_colors_json};
   const statusLabels = {status_labels_json};
 
+  function decodeMarkers(payload) {{
+    if (Array.isArray(payload)) {{
+      return payload;
+    }}
+    const decoded = new Array(payload.id.length);
+    for (let i = 0; i < payload.id.length; i += 1) {{
+      const ticketId = String(payload.id[i]);
+      const status = payload.statuses[payload.status[i]];
+      const category = payload.categories[payload.category[i]];
+      const dateTs = payload.date_ts[i];
+      const marker = {{
+        id: ticketId,
+        status_id: status.id,
+        status_label: status.label,
+        category_key: category.key,
+        category_label: category.label,
+        name: payload.name[i],
+        date_text: payload.date_text[i],
+        date_ts: dateTs,
+        year: new Date(dateTs * 1000).getUTCFullYear(),
+        lat: payload.lat[i],
+        lon: payload.lon[i],
+        ticket_url: "https://www.plznito.cz/map/" + encodeURIComponent(ticketId)
+      }};
+      if (payload.description) {{
+        marker.description = payload.description[i];
+        marker.solution = payload.solution[i];
+        marker.photo_url = payload.photo_url[i];
+      }}
+      decoded[i] = marker;
+    }}
+    return decoded;
+  }}
+
   function colorForStatus(statusId) {{
     return statusColors[String(statusId)] || "red";
   }}
@@ -568,20 +1120,24 @@ def _build_map_html(serialized_data, cluster=False):
     maxZoom: 18
   }}).addTo(map);
 
-  const displayLayer = useCluster ? L.markerClusterGroup() : L.layerGroup();
+  const displayLayer = useCluster && clusterPyramid === null ? L.markerClusterGroup() : L.layerGroup();
   displayLayer.addTo(map);
 
-  const markerEntries = markers.map(function (marker) {{
-    const markerIcon = L.AwesomeMarkers.icon({{
-      icon: "ok-sign",
-      prefix: "glyphicon",
-      iconColor: "white",
-      markerColor: colorForStatus(marker.status_id)
+  let markerEntries = [];
+
+  function buildMarkerEntries(markers) {{
+    return markers.map(function (marker) {{
+      const markerIcon = L.AwesomeMarkers.icon({{
+        icon: "ok-sign",
+        prefix: "glyphicon",
+        iconColor: "white",
+        markerColor: colorForStatus(marker.status_id)
+      }});
+      const markerObj = L.marker([marker.lat, marker.lon], {{ icon: markerIcon }});
+      markerObj.bindPopup(buildPopupContent(marker), {{ maxWidth: 300, minWidth: 300 }});
+      return {{ marker: marker, markerObj: markerObj }};
     }});
-    const markerObj = L.marker([marker.lat, marker.lon], {{ icon: markerIcon }});
-    markerObj.bindPopup(buildPopupContent(marker), {{ maxWidth: 300, minWidth: 300 }});
-    return {{ marker: marker, markerObj: markerObj }};
-  }});
+  }}
 
   function appendCheckboxFilters(containerId, options, idPrefix, dataAttribute) {{
     const container = document.getElementById(containerId);
@@ -660,7 +1216,192 @@ def _build_map_html(serialized_data, cluster=False):
     return true;
   }}
 
+  const markerEntryCache = new Map();
+  let viewportRequestSeq = 0;
+
+  function markerEntryFor(marker) {{
+    let entry = markerEntryCache.get(marker.id);
+    if (!entry) {{
+      entry = buildMarkerEntries([marker])[0];
+      markerEntryCache.set(marker.id, entry);
+    }}
+    return entry;
+  }}
+
+  function buildCellMarker(cell) {{
+    const cellMarker = L.circleMarker([cell.lat, cell.lon], {{
+      radius: Math.min(30, 10 + Math.log(cell.count) * 3),
+      color: "#3174a1",
+      weight: 2,
+      fillOpacity: 0.5
+    }});
+    cellMarker.bindTooltip(String(cell.count), {{
+      permanent: true,
+      direction: "center",
+      className: "plznito-cell-label"
+    }});
+    cellMarker.on("click", function () {{
+      map.setView([cell.lat, cell.lon], map.getZoom() + 2);
+    }});
+    return cellMarker;
+  }}
+
+  function appendFilterParams(params, name, selector, attributeName) {{
+    const keys = selectedKeys(selector, attributeName);
+    if (!keys.size) {{
+      params.append(name, "");
+    }}
+    keys.forEach(function (key) {{
+      params.append(name, key);
+    }});
+  }}
+
+  function fetchViewport() {{
+    const timeFilterElement = document.getElementById("plznito-filter-time");
+    const params = new URLSearchParams();
+    params.set("bbox", map.getBounds().toBBoxString());
+    params.set("zoom", String(map.getZoom()));
+    params.set("time", timeFilterElement ? timeFilterElement.value : defaultTimeFilter);
+    params.set("ts", String(generatedTs));
+    appendFilterParams(params, "status", "input[id^='plznito-filter-status-']:checked", "data-status-key");
+    appendFilterParams(params, "category", "input[id^='plznito-filter-category-']:checked", "data-category-key");
+
+    const requestSeq = ++viewportRequestSeq;
+    const counterElement = document.getElementById("plznito-filter-count");
+    fetch(markersApiUrl + "?" + params.toString())
+      .then(function (response) {{
+        if (!response.ok) {{
+          throw new Error("HTTP " + response.status);
+        }}
+        return response.json();
+      }})
+      .then(function (result) {{
+        if (requestSeq !== viewportRequestSeq) {{
+          return;
+        }}
+        displayLayer.clearLayers();
+        if (result.cells) {{
+          result.cells.forEach(function (cell) {{
+            buildCellMarker(cell).addTo(displayLayer);
+          }});
+        }} else {{
+          result.markers.forEach(function (marker) {{
+            markerEntryFor(marker).markerObj.addTo(displayLayer);
+          }});
+        }}
+        counterElement.textContent = "Ve výřezu: " + result.total + " / " + result.indexed +
+          (result.truncated ? " (zobrazeno " + result.markers.length + " nejnovějších)" : "");
+      }})
+      .catch(function (error) {{
+        if (requestSeq === viewportRequestSeq) {{
+          counterElement.textContent = "Data se nepodařilo načíst (" + error.message + ").";
+        }}
+      }});
+  }}
+
+  let expandedMarkers = null;
+  let expandedMarkersRequested = false;
+
+  function selectedGroups(selectedTime, selectedStatuses, selectedCategories) {{
+    return clusterPyramid.groups.map(function (group) {{
+      const year = group[0];
+      const recency = group[1];
+      let timeMatches = true;
+      if (selectedTime === "last_7_days") {{
+        timeMatches = recency >= 2;
+      }} else if (selectedTime === "last_30_days") {{
+        timeMatches = recency >= 1;
+      }} else if (selectedTime.indexOf("year:") === 0) {{
+        timeMatches = String(year) === selectedTime.slice(5);
+      }}
+      return timeMatches && selectedStatuses.has(group[2]) && selectedCategories.has(group[3]);
+    }});
+  }}
+
+  function loadExpandedMarkers() {{
+    expandedMarkersRequested = true;
+    const counterElement = document.getElementById("plznito-filter-count");
+    counterElement.textContent = "Načítám data…";
+    fetch(markersUrl)
+      .then(function (response) {{
+        if (!response.ok) {{
+          throw new Error("HTTP " + response.status);
+        }}
+        return response.json();
+      }})
+      .then(function (payload) {{
+        expandedMarkers = decodeMarkers(payload);
+        renderClusterPyramid();
+      }})
+      .catch(function (error) {{
+        expandedMarkersRequested = false;
+        counterElement.textContent = "Data se nepodařilo načíst (" + error.message + ").";
+      }});
+  }}
+
+  function renderClusterPyramid() {{
+    const timeFilterElement = document.getElementById("plznito-filter-time");
+    const selectedTime = timeFilterElement ? timeFilterElement.value : defaultTimeFilter;
+    const selectedStatuses = selectedKeys("input[id^='plznito-filter-status-']:checked", "data-status-key");
+    const selectedCategories = selectedKeys("input[id^='plznito-filter-category-']:checked", "data-category-key");
+    const counterElement = document.getElementById("plznito-filter-count");
+    const zoom = map.getZoom();
+    const bounds = map.getBounds().pad(0.25);
+    let shownCount = 0;
+
+    if (zoom >= clusterPyramid.expand_zoom) {{
+      if (expandedMarkers === null) {{
+        if (!expandedMarkersRequested) {{
+          loadExpandedMarkers();
+        }}
+        return;
+      }}
+      displayLayer.clearLayers();
+      expandedMarkers.forEach(function (marker) {{
+        if (!matchesTimeFilter(marker, selectedTime)) {{
+          return;
+        }}
+        if (!selectedStatuses.has(String(marker.status_id)) || !selectedCategories.has(marker.category_key)) {{
+          return;
+        }}
+        shownCount += 1;
+        if (bounds.contains([marker.lat, marker.lon])) {{
+          markerEntryFor(marker).markerObj.addTo(displayLayer);
+        }}
+      }});
+    }} else {{
+      const groupSelected = selectedGroups(selectedTime, selectedStatuses, selectedCategories);
+      const level = clusterPyramid.levels[String(Math.max(zoom, clusterPyramid.min_zoom))];
+      displayLayer.clearLayers();
+      level.forEach(function (cluster) {{
+        const breakdown = cluster[3];
+        let count = 0;
+        for (let i = 0; i < breakdown.length; i += 2) {{
+          if (groupSelected[breakdown[i]]) {{
+            count += breakdown[i + 1];
+          }}
+        }}
+        if (!count) {{
+          return;
+        }}
+        shownCount += count;
+        if (bounds.contains([cluster[0], cluster[1]])) {{
+          buildCellMarker({{ lat: cluster[0], lon: cluster[1], count: count }}).addTo(displayLayer);
+        }}
+      }});
+    }}
+    counterElement.textContent = "Zobrazeno: " + shownCount + " / " + clusterPyramid.total;
+  }}
+
   function applyFilters() {{
+    if (clusterPyramid !== null) {{
+      renderClusterPyramid();
+      return;
+    }}
+    if (markersApiUrl !== null) {{
+      fetchViewport();
+      return;
+    }}
     const timeFilterElement = document.getElementById("plznito-filter-time");
     const selectedTime = timeFilterElement ? timeFilterElement.value : defaultTimeFilter;
     const selectedStatuses = selectedKeys("input[id^='plznito-filter-status-']:checked", "data-status-key");
@@ -724,16 +1465,41 @@ def _build_map_html(serialized_data, cluster=False):
   );
   document.getElementById("plznito-filter-reset").addEventListener("click", resetFilters);
 
-  applyFilters();
+  function start(markers) {{
+    markerEntries = buildMarkerEntries(markers);
+    applyFilters();
+  }}
+
+  if (clusterPyramid !== null) {{
+    map.on("moveend", renderClusterPyramid);
+    renderClusterPyramid();
+  }} else if (markersApiUrl !== null) {{
+    map.on("moveend", fetchViewport);
+    fetchViewport();
+  }} else if (markersUrl === null) {{
+    start(decodeMarkers(inlineMarkers));
+  }} else {{
+    document.getElementById("plznito-filter-count").textContent = "Načítám data…";
+    fetch(markersUrl)
+      .then(function (response) {{
+        if (!response.ok) {{
+          throw new Error("HTTP " + response.status);
+        }}
+        return response.json();
+      }})
+      .then(function (payload) {{
+        start(decodeMarkers(payload));
+      }})
+      .catch(function (error) {{
+        document.getElementById("plznito-filter-count").textContent = "Data se nepodařilo načíst (" + error.message + ").";
+      }});
+  }}
 }})();
 </script>
 """
 
 
-def get_map(data_current, cluster=False, popup_mode="compact"):
-    serialized_data = serialize_map_data(data_current, popup_mode=popup_mode)
-    stats = serialized_data["stats"]
-
+def _log_map_summary(stats):
     logger.info(
         (
             "Map processing summary: input=%d, valid_rendered=%d, added_last_7=%d, added_last_30=%d, "
@@ -750,27 +1516,327 @@ def get_map(data_current, cluster=False, popup_mode="compact"):
         stats["skipped_invalid_date"],
         stats["skipped_invalid_coordinates"],
     )
+    _DATE_PARSER.log_stats(logger, "map records")
 
-    return _build_map_html(serialized_data, cluster=cluster)
 
+def get_map(data_current, cluster=False, popup_mode="compact", payload_format="objects", batch=False):
+    serialized_data = serialize_map_data(data_current, popup_mode=popup_mode, batch=batch)
+    _log_map_summary(serialized_data["stats"])
+    return _build_map_html(serialized_data, cluster=cluster, payload_format=payload_format)
+
+
+_MARKERS_PLACEHOLDER = "__PLZNITO_MARKERS_JSON__"
+DATA_URL_PREFIX_DEFAULT = "/plznito/data/"
+MARKERS_API_PREFIX_DEFAULT = "/plznito/api/markers/"
+MARKERS_ASSET_KEEP = 2
+
+
+def _map_html_parts(serialized_data, cluster=False, markers_url=None, markers_api_url=None, cluster_pyramid=None):
+    """Return the minified page split into the parts before and after the markers JSON."""
+    html = _minify_html(_build_map_html(
+        serialized_data,
+        cluster=cluster,
+        markers_json=_MARKERS_PLACEHOLDER,
+        markers_url=markers_url,
+        markers_api_url=markers_api_url,
+        cluster_pyramid=cluster_pyramid,
+    ))
+    head, tail = html.split(_MARKERS_PLACEHOLDER)
+    return head, tail
+
+
+def _write_markers_payload(fw, markers, payload_format="objects", popup_mode="compact"):
+    if payload_format == "columnar":
+        columnar = ColumnarMarkers(popup_mode=popup_mode, spool=True)
+        try:
+            for marker_data in markers:
+                columnar.add(marker_data)
+            columnar.write(fw)
+        finally:
+            columnar.close()
+        return
+
+    fw.write("[")
+    for index, marker_data in enumerate(markers):
+        if index:
+            fw.write(",")
+        fw.write(_json_for_inline_script(marker_data))
+    fw.write("]")
+
+
+class _HashingWriter:
+    def __init__(self, fw):
+        self._fw = fw
+        self.digest = hashlib.sha256()
+
+    def write(self, text):
+        self.digest.update(text.encode("utf-8"))
+        return self._fw.write(text)
+
+
+def _write_compressed(source_path, target_path, compress_chunks):
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_markers_", dir=os.path.dirname(target_path))
+    try:
+        with open(source_path, "rb") as fr, os.fdopen(fd, "wb") as fw:
+            compress_chunks(iter(lambda: fr.read(1 << 16), b""), fw)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _gzip_chunks(chunks, fw):
+    with gzip.GzipFile(filename="", mode="wb", fileobj=fw, compresslevel=9, mtime=0) as gz:
+        for chunk in chunks:
+            gz.write(chunk)
+
+
+def _brotli_chunks(chunks, fw):
+    compressor = brotli.Compressor(quality=11)
+    for chunk in chunks:
+        fw.write(compressor.process(chunk))
+    fw.write(compressor.finish())
+
+
+def _prune_markers_assets(data_dir, basename, keep=MARKERS_ASSET_KEEP):
+    asset_re = re.compile(rf"^{re.escape(basename)}\.[0-9a-f]{{16}}\.json$")
+    assets = [
+        os.path.join(data_dir, fname) for fname in os.listdir(data_dir) if asset_re.match(fname)
+    ]
+    assets.sort(key=os.path.getmtime, reverse=True)
+    for asset_path in assets[keep:]:
+        for path in (asset_path, asset_path + ".gz", asset_path + ".br"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_markers_asset(data_dir, basename, write_payload):
+    """
+    Write the markers payload as ``<basename>.<content hash>.json`` into ``data_dir``.
+
+    ``write_payload(fw)`` writes the JSON text. Precompressed ``.gz`` and, when the
+    brotli package is installed, ``.br`` siblings are written next to it, and all but
+    the newest MARKERS_ASSET_KEEP generations are removed. Returns the file name.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_markers_", suffix=".json", dir=data_dir)
+    os.close(fd)
+    try:
+        with open(temp_path, "w", encoding="utf-8") as fw:
+            hashing_writer = _HashingWriter(fw)
+            write_payload(hashing_writer)
+        asset_name = f"{basename}.{hashing_writer.digest.hexdigest()[:16]}.json"
+        asset_path = os.path.join(data_dir, asset_name)
+        _write_compressed(temp_path, asset_path + ".gz", _gzip_chunks)
+        if brotli is not None:
+            _write_compressed(temp_path, asset_path + ".br", _brotli_chunks)
+        os.replace(temp_path, asset_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    _prune_markers_assets(data_dir, basename)
+    logger.info("Saved markers data to %s", asset_path)
+    return asset_name
+
+
+def write_map_streaming(fw, data_records, cluster=False, popup_mode="compact", now=None,
+                        payload_format="objects", data_dir=None, asset_basename="markers",
+                        data_url_prefix=DATA_URL_PREFIX_DEFAULT, markers_api_prefix=None, precluster=False,
+                        marker_cache=None):
+    """
+    Render the map into the open text file ``fw`` without holding all markers in memory.
+
+    The markers are the first data in the page script, so the static head is written,
+    then markers one by one as ``data_records`` is iterated, and finally the tail with
+    years, filter options and other values known only after the last record. With
+    ``data_dir`` the markers go to a standalone asset (see write_markers_asset), and
+    with ``markers_api_prefix`` as well the page queries the viewport API for them.
+    ``precluster`` inlines a ClusterPyramid and loads the asset only at high zoom.
+    With ``marker_cache``, ``data_records`` holds the ``(ticket_id, digest, record,
+    record_json)`` tuples of iter_map_markers_cached.
+    """
+    if popup_mode not in {"compact", "full"}:
+        raise ValueError("popup_mode must be 'compact' or 'full'.")
+    if now is None:
+        now = datetime.datetime.now()
+
+    summary = _new_map_summary(popup_mode, now)
+    # The head does not depend on the data, the empty summary only fills the template.
+    head, _ = _map_html_parts(_finalize_map_summary(_new_map_summary(popup_mode, now)), cluster=cluster)
+    fw.write(head)
+
+    if marker_cache is not None:
+        markers = iter_map_markers_cached(data_records, summary, marker_cache)
+    else:
+        markers = iter_map_markers(data_records, summary)
+    pyramid = None
+    if precluster:
+        pyramid = ClusterPyramid(_to_unix_timestamp(now))
+        markers = pyramid.iter_add(markers)
+    markers_url = None
+    markers_api_url = None
+    if data_dir:
+        asset_name = write_markers_asset(
+            data_dir,
+            asset_basename,
+            lambda asset_fw: _write_markers_payload(asset_fw, markers, payload_format, popup_mode),
+        )
+        if markers_api_prefix:
+            markers_api_url = markers_api_prefix + asset_basename
+        else:
+            markers_url = data_url_prefix + asset_name
+        fw.write("null")
+    else:
+        _write_markers_payload(fw, markers, payload_format, popup_mode)
+
+    serialized_data = _finalize_map_summary(summary)
+    _, tail = _map_html_parts(serialized_data, cluster=cluster, markers_url=markers_url,
+                              markers_api_url=markers_api_url,
+                              cluster_pyramid=pyramid.to_data() if pyramid else None)
+    fw.write(tail)
+    return serialized_data
+
+
+class _JsonStreamReader:
+    """Incremental reader for a JSON document, decoding one value at a time."""
+
+    def __init__(self, fr, chunk_size):
+        self._fr = fr
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_size=0):
+        if self._pos > self._chunk_size:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        chunk = self._fr.read(max(self._chunk_size, min_size))
+        if not chunk:
+            self._eof = True
+        self._buffer += chunk
+
+    def peek(self):
+        """Return the next non-whitespace character (empty string at EOF) without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\n\r":
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in input JSON, got {char!r}.")
+        self._pos += 1
+        return char
+
+    def value(self, with_text=False):
+        """Decode the next value; with ``with_text`` return ``(value, source text)``."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._fill(min_size=len(self._buffer) - self._pos)
+                continue
+            # A number ending exactly at the buffer end might continue in the next chunk.
+            if end == len(self._buffer) and not self._eof:
+                self._fill()
+                continue
+            start = self._pos
+            self._pos = end
+            if with_text:
+                return value, self._buffer[start:end]
+            return value
+
+    def iter_array(self, with_text=False):
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value(with_text=with_text)
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_json_records(file_in, chunk_size=1 << 16, with_text=False):
+    """
+    Yield records of a top-level JSON list or of the ``items`` list of a top-level object.
+
+    Only one record (plus a read chunk) is held in memory at a time. With
+    ``with_text`` each record comes as ``(record, its JSON source text)``.
+    """
+    with open(file_in, encoding="utf-8") as fr:
+        reader = _JsonStreamReader(fr, chunk_size)
+        first = reader.peek()
+        if first == "[":
+            yield from reader.iter_array(with_text=with_text)
+            return
+        if first == "{":
+            reader.expect("{")
+            while reader.peek() != "}":
+                key = reader.value()
+                reader.expect(":")
+                if key == "items" and reader.peek() == "[":
+                    yield from reader.iter_array(with_text=with_text)
+                    return
+                reader.value()
+                if reader.expect(",}") == "}":
+                    break
+        raise ValueError("Input JSON must be a list of records or an object with an 'items' list.")
+
+
+def _load_records(file_in, store_path=None):
+    if store_path:
+        logger.info("Loading data from ticket store %s", store_path)
+        with TicketStore(store_path) as store:
+            return store.load_records()
 
-def render_map_to_file(file_in="plznito_cyklo.json", file_out="app/templates/map.html",
-                       cluster=False, popup_mode="compact"):
     logger.info("Loading data from %s", file_in)
     with open(file_in, encoding="utf-8") as fr:
         data = json.load(fr)
 
     if isinstance(data, dict) and isinstance(data.get("items"), list):
-        data_records = data["items"]
-    elif isinstance(data, list):
-        data_records = data
-    else:
-        raise ValueError("Input JSON must be a list of records or an object with an 'items' list.")
+        return data["items"]
+    if isinstance(data, list):
+        return data
+    raise ValueError("Input JSON must be a list of records or an object with an 'items' list.")
+
+
+def _iter_store_records(store_path):
+    with TicketStore(store_path) as store:
+        yield from store.iter_records()
+
+
+def _iter_hashed_json_records(file_in):
+    for record, text in iter_json_records(file_in, with_text=True):
+        ticket_id = record.get("id") if isinstance(record, dict) else None
+        yield ticket_id, hashlib.sha1(text.encode("utf-8")).hexdigest(), record, None
+
+
+def _iter_hashed_store_records(store_path):
+    with TicketStore(store_path) as store:
+        for ticket_id, digest, data in store.iter_hashed_rows():
+            yield ticket_id, digest, None, data
 
-    logger.info("Rendering map from %d records", len(data_records))
-    map_html = get_map(data_records, cluster=cluster, popup_mode=popup_mode)
-    map_html = _minify_html(map_html)
 
+def _markers_asset_basename(file_out):
+    return os.path.splitext(os.path.basename(file_out))[0] + "_markers"
+
+
+def marker_cache_path(file_out):
+    return os.path.splitext(file_out)[0] + ".markers_cache.json"
+
+
+@contextmanager
+def _atomic_output(file_out):
     target_dir = os.path.dirname(os.path.abspath(file_out))
     os.makedirs(target_dir, exist_ok=True)
 
@@ -779,14 +1845,165 @@ def render_map_to_file(file_in="plznito_cyklo.json", file_out="app/templates/map
     os.close(fd)
     try:
         with open(temp_path, "w", encoding="utf-8") as fw:
-            fw.write(map_html)
+            yield fw
         os.replace(temp_path, file_out)
     finally:
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
+
+
+def render_map_to_file(file_in="plznito_cyklo.json", file_out="app/templates/map.html",
+                       cluster=False, popup_mode="compact", store_path=None, filter_cyklo=False,
+                       stream=False, payload_format="objects", data_dir=None,
+                       data_url_prefix=DATA_URL_PREFIX_DEFAULT, markers_api_prefix=None, precluster=False,
+                       batch_normalize=False, incremental=False):
+    _validate_render_options(payload_format, data_dir, markers_api_prefix, precluster)
+    asset_basename = _markers_asset_basename(file_out)
+
+    if stream or incremental:
+        logger.info("Streaming data from %s", store_path or file_in)
+        marker_cache = None
+        if incremental:
+            marker_cache = MarkerCache.load(marker_cache_path(file_out), popup_mode, filter_cyklo=filter_cyklo)
+            data_records = _iter_hashed_store_records(store_path) if store_path else _iter_hashed_json_records(file_in)
+        else:
+            data_records = _iter_store_records(store_path) if store_path else iter_json_records(file_in)
+            if filter_cyklo:
+                data_records = iter_cyklo_items(data_records)
+        with _atomic_output(file_out) as fw:
+            serialized_data = write_map_streaming(fw, data_records, cluster=cluster, popup_mode=popup_mode,
+                                                  payload_format=payload_format, data_dir=data_dir,
+                                                  asset_basename=asset_basename,
+                                                  data_url_prefix=data_url_prefix,
+                                                  markers_api_prefix=markers_api_prefix,
+                                                  precluster=precluster,
+                                                  marker_cache=marker_cache)
+        if marker_cache is not None:
+            marker_cache.save()
+        _log_map_summary(serialized_data["stats"])
+        logger.info("Saved map to %s", file_out)
+        return
+
+    data_records = _load_records(file_in, store_path=store_path)
+    if filter_cyklo:
+        data_records = filter_cyklo_items(data_records)
+
+    logger.info("Rendering map from %d records", len(data_records))
+    serialized_data = serialize_map_data(data_records, popup_mode=popup_mode, batch=batch_normalize)
+    _log_map_summary(serialized_data["stats"])
+    _write_map_page(serialized_data, file_out, cluster=cluster, payload_format=payload_format, data_dir=data_dir,
+                    data_url_prefix=data_url_prefix, markers_api_prefix=markers_api_prefix, precluster=precluster)
+
+
+def _write_map_page(serialized_data, file_out, cluster=False, payload_format="objects", data_dir=None,
+                    data_url_prefix=DATA_URL_PREFIX_DEFAULT, markers_api_prefix=None, precluster=False):
+    """Write the page (and with ``data_dir`` its markers asset) for already serialized map data."""
+    if data_dir:
+        asset_basename = _markers_asset_basename(file_out)
+        popup_mode = serialized_data["popup_mode"]
+        markers_json = _markers_json(serialized_data["markers"], payload_format, popup_mode)
+        asset_name = write_markers_asset(data_dir, asset_basename, lambda fw: fw.write(markers_json))
+        if markers_api_prefix:
+            map_html = _build_map_html(serialized_data, cluster=cluster,
+                                       markers_api_url=markers_api_prefix + asset_basename)
+        elif precluster:
+            pyramid = ClusterPyramid(serialized_data["generated_ts"])
+            for marker_data in serialized_data["markers"]:
+                pyramid.add(marker_data)
+            map_html = _build_map_html(serialized_data, cluster=cluster, markers_url=data_url_prefix + asset_name,
+                                       cluster_pyramid=pyramid.to_data())
+        else:
+            map_html = _build_map_html(serialized_data, cluster=cluster, markers_url=data_url_prefix + asset_name)
+    else:
+        map_html = _build_map_html(serialized_data, cluster=cluster, payload_format=payload_format)
+
+    with _atomic_output(file_out) as fw:
+        write_minified_html(fw, map_html)
     logger.info("Saved map to %s", file_out)
 
 
+# One page of a multi-target render; options default like the render_map_to_file arguments.
+MapTarget = namedtuple(
+    "MapTarget",
+    ["file_out", "filter_cyklo", "popup_mode", "cluster", "payload_format", "markers_api_prefix", "precluster"],
+    defaults=[False, "compact", False, "objects", None, False],
+)
+
+
+def _validate_render_options(payload_format, data_dir, markers_api_prefix, precluster):
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ValueError(f"payload_format must be one of {PAYLOAD_FORMATS}.")
+    if markers_api_prefix and not data_dir:
+        raise ValueError("markers_api_prefix needs data_dir, the API serves the markers asset.")
+    if precluster and (not data_dir or markers_api_prefix):
+        raise ValueError("precluster needs data_dir and cannot be combined with markers_api_prefix.")
+
+
+def render_map_targets(file_in, targets, store_path=None, data_dir=None, data_url_prefix=DATA_URL_PREFIX_DEFAULT):
+    """
+    Render several pages (MapTarget) from one load of ``file_in``/``store_path``.
+
+    Records are parsed, cyklo-filtered and normalized once; each target only
+    serializes the markers for its popup mode and writes its page.
+    """
+    for target in targets:
+        if target.popup_mode not in {"compact", "full"}:
+            raise ValueError("popup_mode must be 'compact' or 'full'.")
+        _validate_render_options(target.payload_format, data_dir, target.markers_api_prefix, target.precluster)
+    asset_basenames = [_markers_asset_basename(target.file_out) for target in targets]
+    if len(set(asset_basenames)) != len(asset_basenames):
+        raise ValueError("Map targets need distinct file_out names, their markers assets would collide.")
+
+    data_records = _load_records(file_in, store_path=store_path)
+    normalized_records = list(iter_normalized_records(data_records))
+    cyklo_records = None
+    if any(target.filter_cyklo for target in targets):
+        cyklo_item_ids = {id(item) for item in iter_cyklo_items(data_records)}
+        cyklo_records = [record for record in normalized_records if id(record[0]) in cyklo_item_ids]
+    logger.info("Rendering %d maps from %d records", len(targets), len(data_records))
+    if cyklo_records is not None:
+        logger.info("%d records are cycling-related", len(cyklo_records))
+
+    now = datetime.datetime.now()
+    for target in targets:
+        summary = _new_map_summary(target.popup_mode, now)
+        records = cyklo_records if target.filter_cyklo else normalized_records
+        serialized_data = _finalize_map_summary(summary, list(iter_normalized_map_markers(records, summary)))
+        _log_map_summary(serialized_data["stats"])
+        _write_map_page(serialized_data, target.file_out, cluster=target.cluster,
+                        payload_format=target.payload_format, data_dir=data_dir, data_url_prefix=data_url_prefix,
+                        markers_api_prefix=target.markers_api_prefix, precluster=target.precluster)
+
+
+def parse_target_spec(spec, popup_mode="compact", payload_format="objects",
+                      markers_api_prefix=MARKERS_API_PREFIX_DEFAULT):
+    """
+    Parse a ``--target`` value ``FILE_OUT[:OPTION,...]`` into a MapTarget.
+
+    Options are ``cyklo``, ``cluster``, ``markers_api``, ``precluster``,
+    ``popup=compact|full`` and ``format=objects|columnar``; popup mode and format
+    default to the given values.
+    """
+    file_out, _, options = spec.partition(":")
+    if not file_out:
+        raise ValueError(f"Map target {spec!r} has no output file.")
+    values = {"file_out": file_out, "popup_mode": popup_mode, "payload_format": payload_format}
+    flags = {"cyklo": "filter_cyklo", "cluster": "cluster", "precluster": "precluster"}
+    for option in filter(None, options.split(",")):
+        name, has_value, value = option.partition("=")
+        if name in flags and not has_value:
+            values[flags[name]] = True
+        elif name == "markers_api" and not has_value:
+            values["markers_api_prefix"] = markers_api_prefix
+        elif name == "popup" and value in ("compact", "full"):
+            values["popup_mode"] = value
+        elif name == "format" and value in PAYLOAD_FORMATS:
+            values["payload_format"] = value
+        else:
+            raise ValueError(f"Unknown option {option!r} in map target {spec!r}.")
+    return MapTarget(**values)
+
+
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
@@ -796,7 +2013,47 @@ if __name__ == '__main__':
     parser.add_argument("--file_out", type=str, default="app/templates/map.html")
     parser.add_argument("--cluster_style", action="store_true")
     parser.add_argument("--popup_mode", type=str, default="compact", choices=["compact", "full"])
+    parser.add_argument("--store", type=str, default=None,
+                        help="Read tickets from this SQLite ticket store instead of --file_in.")
+    parser.add_argument("--filter_cyklo", action="store_true",
+                        help="Render only cycling-related tickets.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream records and markers so memory stays bounded for large inputs.")
+    parser.add_argument("--payload_format", type=str, default="objects", choices=PAYLOAD_FORMATS,
+                        help="Inline markers as an array of objects or as a compact columnar payload.")
+    parser.add_argument("--data_dir", type=str, default=None,
+                        help="Write markers to a hashed, precompressed JSON asset in this directory "
+                             "instead of inlining them into the page.")
+    parser.add_argument("--data_url_prefix", type=str, default=DATA_URL_PREFIX_DEFAULT,
+                        help="URL prefix the page uses to fetch the markers asset.")
+    parser.add_argument("--markers_api", nargs="?", const=MARKERS_API_PREFIX_DEFAULT, default=None,
+                        metavar="URL_PREFIX",
+                        help="Let the page query markers in view from the viewport API "
+                             f"(default prefix {MARKERS_API_PREFIX_DEFAULT}). Needs --data_dir.")
+    parser.add_argument("--precluster", action="store_true",
+                        help="Precompute marker clusters per zoom level into the page and load the markers "
+                             "asset only when zoomed in. Needs --data_dir.")
+    parser.add_argument("--batch_normalize", action="store_true",
+                        help="Normalize records column-wise with NumPy (ignored with --stream).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse markers of unchanged tickets from <file_out>.markers_cache.json "
+                             "(streams the input like --stream).")
+    parser.add_argument("--target", dest="targets", action="append", default=[], metavar="FILE_OUT[:OPTIONS]",
+                        help="Render this page from a single load of the input; repeat for more pages. "
+                             "OPTIONS: cyklo, cluster, markers_api, precluster, popup=compact|full, "
+                             "format=objects|columnar (see parse_target_spec). Replaces --file_out.")
     args = parser.parse_args()
+    if args.targets and (args.stream or args.incremental):
+        parser.error("--target renders from memory and cannot be combined with --stream or --incremental.")
+    if args.targets:
+        per_target = [flag for flag, value in (("--cluster_style", args.cluster_style),
+                                               ("--filter_cyklo", args.filter_cyklo),
+                                               ("--precluster", args.precluster)) if value]
+        if per_target:
+            parser.error(f"{', '.join(per_target)} cannot be combined with --target; "
+                         "use the target options cluster, cyklo and precluster instead.")
+        if args.batch_normalize:
+            parser.error("--batch_normalize cannot be combined with --target.")
 
     log_level = getattr(logging, args.log_level.upper(), logging.INFO)
     logging.basicConfig(filename='plznito_monitoring.log',
@@ -804,4 +2061,21 @@ if __name__ == '__main__':
                         format='%(asctime)s %(message)s')
     logger.setLevel(log_level)
 
-    render_map_to_file(args.file_in, args.file_out, cluster=args.cluster_style, popup_mode=args.popup_mode)
+    if args.targets:
+        try:
+            map_targets = [
+                parse_target_spec(spec, popup_mode=args.popup_mode, payload_format=args.payload_format,
+                                  markers_api_prefix=args.markers_api or MARKERS_API_PREFIX_DEFAULT)
+                for spec in args.targets
+            ]
+        except ValueError as exc:
+            parser.error(str(exc))
+        render_map_targets(args.file_in, map_targets, store_path=args.store, data_dir=args.data_dir,
+                           data_url_prefix=args.data_url_prefix)
+    else:
+        render_map_to_file(args.file_in, args.file_out, cluster=args.cluster_style, popup_mode=args.popup_mode,
+                           store_path=args.store, filter_cyklo=args.filter_cyklo, stream=args.stream,
+                           payload_format=args.payload_format, data_dir=args.data_dir,
+                           data_url_prefix=args.data_url_prefix, markers_api_prefix=args.markers_api,
+                           precluster=args.precluster, batch_normalize=args.batch_normalize,
+                           incremental=args.incremental)
@@ -0,0 +1,147 @@
+"""
+snapshot_codec.py — read and write raw crawl snapshots in several formats.
+
+A snapshot is the ``{"items": [...]}`` payload of one crawl. The format is named
+by the file extension, so the loader needs no configuration:
+
+* ``.json`` / ``.jsonl`` — compact JSON, or JSON Lines with one ticket per line;
+* ``.gz``, ``.bz2`` or ``.zst`` on top of either (zstd needs the optional
+  ``zstandard`` package). Bare ``.bz2`` files are the legacy indented JSON snapshots.
+
+Usage:
+    python snapshot_codec.py --convert data/2024-01-01-06:00:00.json.bz2 --format json.gz
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst snapshots
+    zstandard = None
+
+SNAPSHOT_FORMATS = ("jsonl.gz", "json.gz", "jsonl.zst", "json.zst", "json.bz2", "jsonl", "json")
+SNAPSHOT_FORMAT_DEFAULT = "json.gz"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+_COMPRESSIONS = (".gz", ".bz2", ".zst")
+
+
+def _split_extension(path):
+    """Return ``(compression suffix or "", is JSON Lines)``, or None for other files."""
+    base, compression = os.path.splitext(path)
+    if compression not in _COMPRESSIONS:
+        base, compression = path, ""
+    if base.endswith(".jsonl"):
+        return compression, True
+    if base.endswith(".json") or compression == ".bz2":
+        return compression, False
+    return None
+
+
+def is_snapshot_file(path):
+    return _split_extension(path) is not None
+
+
+def _open_binary(path, mode, compression):
+    if compression == ".gz":
+        return gzip.open(path, mode + "b", compresslevel=GZIP_LEVEL)
+    if compression == ".bz2":
+        return bz2.open(path, mode + "b")
+    if compression == ".zst":
+        if zstandard is None:
+            raise ValueError(f"Reading or writing {path} needs the zstandard package.")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, mode + "b")
+
+
+def write_snapshot(path, data):
+    """Write the ``{"items": [...]}`` payload in the format named by ``path``."""
+    spec = _split_extension(path)
+    if spec is None:
+        raise ValueError(f"Unknown snapshot format for {path}, expected one of {SNAPSHOT_FORMATS}.")
+    compression, json_lines = spec
+    if json_lines:
+        text = "".join(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in data["items"])
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    with _open_binary(path, "w", compression) as fw:
+        fw.write(text.encode("utf-8"))
+
+
+def _read_zstd(path):
+    """
+    Return the decompressed frames of a .zst file.
+
+    zstandard raises ZstdError, which is no ValueError, and its stream reader
+    returns a truncated frame's partial output without an error. Both become
+    ValueError here.
+    """
+    with open(path, "rb") as fr:
+        data = fr.read()
+    chunks = []
+    try:
+        while True:
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+            chunks.append(decompressor.decompress(data))
+            if not decompressor.eof:
+                raise ValueError(f"Truncated zstd snapshot {path}.")
+            data = decompressor.unused_data
+            if not data:
+                return b"".join(chunks)
+    except zstandard.ZstdError as exc:
+        raise ValueError(f"Corrupt zstd snapshot {path}: {exc}") from exc
+
+
+def load_snapshot(path):
+    """
+    Return the payload of a snapshot file, or None when ``path`` is not one.
+
+    A corrupt file raises OSError, EOFError or ValueError, whatever its compression.
+    """
+    spec = _split_extension(path)
+    if spec is None:
+        return None
+    compression, json_lines = spec
+    # Whole-buffer reads: decompressing and decoding in one call beats a text wrapper.
+    if compression == ".zst" and zstandard is not None:
+        raw = _read_zstd(path)
+    else:
+        with _open_binary(path, "r", compression) as fr:
+            raw = fr.read()
+    if json_lines:
+        # json.dumps escapes newlines in strings, so b"\n" only ever ends a record.
+        return {"items": [json.loads(line) for line in raw.split(b"\n") if line.strip()]}
+    return json.loads(raw)
+
+
+def snapshot_filename(stem, snapshot_format=SNAPSHOT_FORMAT_DEFAULT):
+    if snapshot_format not in SNAPSHOT_FORMATS:
+        raise ValueError(f"snapshot_format must be one of {SNAPSHOT_FORMATS}.")
+    return f"{stem}.{snapshot_format}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--convert", type=str, nargs="+", required=True, help="Snapshot files to convert.")
+    parser.add_argument("--format", type=str, default=SNAPSHOT_FORMAT_DEFAULT, choices=SNAPSHOT_FORMATS)
+    args = parser.parse_args()
+
+    for source in args.convert:
+        payload = load_snapshot(source)
+        if payload is None:
+            raise SystemExit(f"{source} is not a snapshot file.")
+        stem = source
+        for suffix in _COMPRESSIONS + (".jsonl", ".json"):
+            stem = stem[:-len(suffix)] if stem.endswith(suffix) else stem
+        target = snapshot_filename(stem, args.format)
+        if target == source:
+            continue
+        write_snapshot(target, payload)
+        print(f"{source} -> {target} ({os.path.getsize(source)} -> {os.path.getsize(target)} bytes)")
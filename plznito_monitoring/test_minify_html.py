@@ -0,0 +1,90 @@
+"""
+test_minify_html.py — write_minified_html against the previous regex minifier.
+
+Run from the repo root with ``python -m pytest plznito_monitoring``.
+"""
+
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+from bench_minify_html import minify_html_legacy
+from run_map_render import write_minified_html
+
+EDGE_CASES = [
+    "",
+    "   \n\t ",
+    "<p>a</p>",
+    "  <html>\n  <body>\n    <p> a  b </p>\n  </body>\n</html>\n",
+    "text only  ",
+    "<a>  x  </a>   <b> </b>",
+    # comments
+    "<p>a</p> <!-- comment --> <p>b</p>",
+    "<!--a--><!--b-->  <p>c</p><!---->",
+    "<p>a<!-- multi\nline\ncomment -->b</p>",
+    "<!-- <p>nested <!-- inner --> outer --> tail",
+    # conditional comments are kept
+    "<head><!--[if lt IE 9]><script src='x.js'></script><![endif]--></head>",
+    "<!--  [if IE]> <p>ie</p> <![endif]-->",
+    "<!--[if IE]>a<![endif]--> <!-- gone --> <p>b</p>",
+    # unterminated comments are text, and so is every comment after them
+    "<p>a</p>  <!-- never closed  <p>b</p>",
+    "<p>a</p> <!-- open <!-- closed --> <p>b</p>",
+    "<!--",
+    "<!-- -- >",
+    # "-->" inside a preserved block does not end a comment
+    "<!-- <script>var s = '-->';</script> still comment --> <p>x</p>",
+    "<script>var s = '<!-- not a comment -->';</script>  <p>y</p>",
+    "<!-- <script>no end --> <p>z</p>",
+    "<!-- <style>a{}</style> --> <p>w</p>",
+    "<!-- a --> <pre>  keep   this  </pre> <!-- b -->",
+    "<!-- <pre>-->",
+    "<!-- <pre> --> </pre> -->",
+    # preserved blocks
+    "<pre>\n  a\n   b\n</pre>  <p> c </p>",
+    "<textarea>  x  <script>y</script>  </textarea> <p>z</p>",
+    "<SCRIPT type='text/javascript'>  a  >   < b  </SCRIPT>  <p>c</p>",
+    "<script>unclosed  <p>a</p>   <p>b</p>",
+    "<scripts>  <p>a</p>  </scripts>",
+    "<style>  p > a { x: 1 }  </style>\n<p> a </p>",
+    "<pre>a</pre><pre>b</pre>  <pre>c</pre>",
+    " <script>a</script> ",
+    "<p>a</p> <script>x</script> <p>b</p> <style>y</style> ",
+    # whitespace kinds matched by \s
+    "<p>a</p>  <p>b</p>\x1c\x1f<i>c</i>\r\n\f\v",
+    "<p>　a　</p>",
+]
+
+# Tokens of the random documents: tags, text, whitespace, comment and block pieces.
+FUZZ_TOKENS = [
+    "<p>", "</p>", "<div class='x'>", "</div>", "<br/>", "a", "b c", "x>y", "<", ">",
+    " ", "  ", "\n", "\t", " ", "\r\n",
+    "<!--", "-->", "--", "<!--[if IE]>", "<![endif]-->", "<!-- [if", "<!---->",
+    "<script>", "</script>", "<SCRIPT>", "</Script>", "<script type='m'>",
+    "<style>", "</style>", "<pre>", "</pre>", "<textarea>", "</textarea>", "<scripts>",
+    "'-->'", "</scri", "pt>",
+]
+
+
+def _minify(html_text):
+    output = io.StringIO()
+    write_minified_html(output, html_text)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("html_text", EDGE_CASES)
+def test_edge_cases_match_legacy(html_text):
+    assert _minify(html_text) == minify_html_legacy(html_text)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_tokens_match_legacy(seed):
+    rng = random.Random(seed)
+    for _ in range(2000):
+        html_text = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 40)))
+        assert _minify(html_text) == minify_html_legacy(html_text), html_text
+
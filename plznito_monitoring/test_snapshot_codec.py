@@ -0,0 +1,77 @@
+"""
+test_snapshot_codec.py — snapshot round trips and corrupt snapshot handling.
+
+Run from the repo root with ``python -m pytest plznito_monitoring``.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+import snapshot_codec
+
+PAYLOAD = {"items": [{"id": 1, "report": "Cyklostezka\nu řeky", "name": None}, {"id": "2", "name": "kolo"}]}
+# The exceptions db_restore treats as "skip this snapshot".
+SNAPSHOT_ERRORS = (OSError, EOFError, ValueError)
+
+
+def _formats():
+    params = []
+    for snapshot_format in snapshot_codec.SNAPSHOT_FORMATS:
+        marks = []
+        if snapshot_format.endswith(".zst"):
+            marks.append(pytest.mark.skipif(snapshot_codec.zstandard is None, reason="needs zstandard"))
+        params.append(pytest.param(snapshot_format, marks=marks, id=snapshot_format))
+    return params
+
+
+@pytest.mark.parametrize("snapshot_format", _formats())
+def test_round_trip(tmp_path, snapshot_format):
+    path = str(tmp_path / snapshot_codec.snapshot_filename("2024-01-01-06:00:00", snapshot_format))
+    snapshot_codec.write_snapshot(path, PAYLOAD)
+
+    assert snapshot_codec.is_snapshot_file(path)
+    assert snapshot_codec.load_snapshot(path) == PAYLOAD
+
+
+@pytest.mark.parametrize("snapshot_format", _formats())
+def test_garbage_file(tmp_path, snapshot_format):
+    path = tmp_path / f"a.{snapshot_format}"
+    path.write_bytes(b"\x00not a snapshot\xff" * 64)
+
+    with pytest.raises(SNAPSHOT_ERRORS):
+        snapshot_codec.load_snapshot(str(path))
+
+
+@pytest.mark.parametrize("snapshot_format", _formats())
+def test_truncated_file(tmp_path, snapshot_format):
+    path = tmp_path / f"a.{snapshot_format}"
+    snapshot_codec.write_snapshot(str(path), {"items": [{"id": i, "report": "x" * i} for i in range(200)]})
+    path.write_bytes(path.read_bytes()[:len(path.read_bytes()) // 2])
+
+    with pytest.raises(SNAPSHOT_ERRORS):
+        snapshot_codec.load_snapshot(str(path))
+
+
+@pytest.mark.skipif(snapshot_codec.zstandard is None, reason="needs zstandard")
+def test_corrupt_zstd_is_value_error(tmp_path):
+    path = tmp_path / "a.json.zst"
+    path.write_bytes(b"garbage" * 10)
+    with pytest.raises(ValueError, match="Corrupt zstd snapshot"):
+        snapshot_codec.load_snapshot(str(path))
+
+    # The stream reader used to return a truncated frame's partial output silently.
+    snapshot_codec.write_snapshot(str(path), PAYLOAD)
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError, match="Truncated zstd snapshot"):
+        snapshot_codec.load_snapshot(str(path))
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("x")
+
+    assert not snapshot_codec.is_snapshot_file(str(path))
+    assert snapshot_codec.load_snapshot(str(path)) is None
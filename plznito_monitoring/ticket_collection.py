@@ -0,0 +1,124 @@
+"""
+ticket_collection.py — in-memory ticket collection indexed by ticket id.
+
+Holds the records of a JSON list DB in a list plus a ticket id -> position dict.
+Merging a delta only touches the delta's records: a merged record is appended and
+leaves a hole at its old position, and the holes are cut out with list slices when
+the records are read back. The record order stays the one merge_data always
+produced: untouched records keep their place, merged records move to the end in
+delta order.
+
+A collection can also be rebuilt from a records list and its persisted ids
+(``from_index``) without reading the records, so an update of a large DB stays
+proportional to its delta.
+"""
+
+from collections import namedtuple
+
+# Ticket ids of a merge, each list in order of first appearance in the delta.
+MergeResult = namedtuple("MergeResult", ["inserted", "updated", "unchanged"])
+
+_MISSING = object()
+
+
+class TicketCollection:
+    """Tickets keyed by id, built from and merged with ``(ticket_id, record)`` pairs."""
+
+    def __init__(self, valid_records=()):
+        pairs = list(valid_records)
+        self._set_slots([record for _, record in pairs], [ticket_id for ticket_id, _ in pairs])
+
+    @classmethod
+    def from_index(cls, records, ticket_ids):
+        """
+        Wrap ``records`` whose normalized ids are ``ticket_ids``, in the same order.
+
+        Raises ValueError when the ids do not pair up one to one with the records.
+        """
+        if len(ticket_ids) != len(records):
+            raise ValueError(f"Got {len(ticket_ids)} ticket ids for {len(records)} records.")
+        collection = cls()
+        collection._set_slots(list(records), list(ticket_ids))
+        if collection._holes:
+            raise ValueError("Ticket ids are not unique.")
+        return collection
+
+    def _set_slots(self, records, ids):
+        self._records = records
+        self._ids = ids  # ticket id of each _records slot
+        self._positions = positions = dict(zip(ids, range(len(ids))))
+        self._holes = []  # _records slots of records that moved to the end
+        if len(positions) != len(ids):
+            # A repeated id keeps its last slot, as if the pairs had been merged one by one.
+            self._holes = [slot for slot, ticket_id in enumerate(ids) if positions[ticket_id] != slot]
+            for slot in self._holes:
+                records[slot] = ids[slot] = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, ticket_id):
+        return ticket_id in self._positions
+
+    def get(self, ticket_id, default=None):
+        position = self._positions.get(ticket_id)
+        return default if position is None else self._records[position]
+
+    def records(self):
+        return self._without_holes(self._records)
+
+    def ids(self):
+        """Return the ticket ids in record order, as ``from_index`` takes them."""
+        return self._without_holes(self._ids)
+
+    def _without_holes(self, slots):
+        if not self._holes:
+            return list(slots)
+        out = []
+        start = 0
+        for hole in sorted(self._holes):
+            out += slots[start:hole]
+            start = hole + 1
+        out += slots[start:]
+        return out
+
+    def _compact(self):
+        self._records = self.records()
+        self._ids = self.ids()
+        self._positions = dict(zip(self._ids, range(len(self._ids))))
+        self._holes = []
+
+    def merge(self, valid_records):
+        """
+        Upsert ``(ticket_id, record)`` pairs, the last pair of an id wins.
+
+        Returns a MergeResult; a re-sent record equal to the stored one counts as
+        unchanged but still moves to the end.
+        """
+        records = self._records
+        ids = self._ids
+        positions = self._positions
+        originals = {}
+        for ticket_id, record in valid_records:
+            position = positions.get(ticket_id)
+            if ticket_id not in originals:
+                originals[ticket_id] = _MISSING if position is None else records[position]
+            if position is not None:
+                records[position] = ids[position] = None
+                self._holes.append(position)
+            positions[ticket_id] = len(records)
+            records.append(record)
+            ids.append(ticket_id)
+        # More holes than records: compact, which keeps merges amortized O(delta).
+        if len(self._holes) > len(positions):
+            self._compact()
+
+        result = MergeResult([], [], [])
+        for ticket_id, original in originals.items():
+            if original is _MISSING:
+                result.inserted.append(ticket_id)
+            elif original == self.get(ticket_id):
+                result.unchanged.append(ticket_id)
+            else:
+                result.updated.append(ticket_id)
+        return result
@@ -0,0 +1,134 @@
+"""
+ticket_store.py — SQLite (WAL) ticket store keyed by ticket id.
+
+Alternative to the monolithic plznito_*.json files: updates only upsert records whose
+content changed, and the JSON list can be exported for backward compatibility.
+
+Usage:
+    python ticket_store.py --db plznito_tickets.sqlite --import plznito_all.json
+    python ticket_store.py --db plznito_tickets.sqlite --export plznito_all.json
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import time
+from collections import Counter
+
+from crawl_state import content_hash
+
+logger = logging.getLogger(__name__)
+
+_LOOKUP_CHUNK = 500
+
+
+class TicketStore:
+    """Tickets as JSON documents in a ``tickets(id, hash, data, updated_ts)`` table."""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                id          INTEGER PRIMARY KEY,
+                hash        TEXT NOT NULL,
+                data        TEXT NOT NULL,
+                updated_ts  INTEGER NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def iter_records(self):
+        """Yield stored records ordered by id without loading the whole table."""
+        for (data,) in self.db.execute("SELECT data FROM tickets ORDER BY id"):
+            yield json.loads(data)
+
+    def load_records(self):
+        return list(self.iter_records())
+
+    def iter_hashed_rows(self):
+        """Yield ``(id, hash, JSON text)`` ordered by id, leaving decoding to the caller."""
+        yield from self.db.execute("SELECT id, hash, data FROM tickets ORDER BY id")
+
+    def _existing_hashes(self, ticket_ids):
+        hashes = {}
+        for offset in range(0, len(ticket_ids), _LOOKUP_CHUNK):
+            chunk = ticket_ids[offset:offset + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(f"SELECT id, hash FROM tickets WHERE id IN ({placeholders})", chunk)
+            hashes.update(rows)
+        return hashes
+
+    def upsert(self, valid_records):
+        """
+        Upsert ``(ticket_id, record)`` pairs, writing only new or changed records.
+
+        Returns a Counter with ``inserted``, ``updated`` and ``unchanged`` counts.
+        """
+        latest = {}
+        for ticket_id, record in valid_records:
+            latest[ticket_id] = record
+
+        existing = self._existing_hashes(list(latest))
+        now = int(time.time())
+        changes = Counter()
+        rows = []
+        for ticket_id, record in latest.items():
+            digest = content_hash(record)
+            previous = existing.get(ticket_id)
+            if previous == digest:
+                changes["unchanged"] += 1
+                continue
+            changes["inserted" if previous is None else "updated"] += 1
+            rows.append((ticket_id, digest, json.dumps(record, ensure_ascii=False, separators=(",", ":")), now))
+
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO tickets(id, hash, data, updated_ts) VALUES(?,?,?,?)",
+                rows,
+            )
+        logger.info(
+            "Ticket store %s: inserted=%d, updated=%d, unchanged=%d.",
+            self.path,
+            changes["inserted"],
+            changes["updated"],
+            changes["unchanged"],
+        )
+        return changes
+
+
+if __name__ == "__main__":
+    from run_db_update import _atomic_write_json, _collect_valid_records, _load_db_records
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, required=True, help="SQLite ticket store path.")
+    parser.add_argument("--import", dest="import_json", type=str, default=None,
+                        help="Upsert records from a JSON list DB file.")
+    parser.add_argument("--export", dest="export_json", type=str, default=None,
+                        help="Write all stored records as a JSON list.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    with TicketStore(args.db) as store:
+        if args.import_json:
+            records = _load_db_records(args.import_json)
+            store.upsert(_collect_valid_records(records, args.import_json))
+        if args.export_json:
+            _atomic_write_json(args.export_json, store.load_records(), indent=4)
+            logger.info("Exported %d tickets to %s.", store.count(), args.export_json)